@@ -0,0 +1,320 @@
+"""Benchmark solvers on fixed workloads.
+
+Every workload runs headless in a fresh subprocess with a fixed seed, so wall
+time, node rate and peak memory are measured in isolation. Startup workloads
+time a complete command line run, including interpreter start and imports.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from src import automata, loops, sudoku_mini
+from src.parallel import solve_parallel
+from src.solver import solve_space
+from src.stats import Stats
+
+if TYPE_CHECKING:
+    from src.space import Space
+
+SEED = 0
+REPEAT = 5
+THRESHOLD = 0.1
+TIME_FLOOR = 0.02
+ROOT = Path(__file__).parent
+SUDOKU_PATH = ROOT / "data" / "sudoku"
+LOOPS_SIZES = (25, 50, 100, 200)
+AUTOMATA_SIZES = (16, 20, 24)
+
+Measurement = dict[str, Any]
+
+
+def sudoku_space(name: str, *, model: bool = False) -> Callable[[], Space]:
+    """Return a factory of a loaded sudoku table."""
+
+    def create() -> Space:
+        table = sudoku_mini.create_table(model=model)
+        with (SUDOKU_PATH / f"{name}.txt").open() as f:
+            table.load(f.read())
+        return table
+
+    return create
+
+
+def loops_space(
+    size: int,
+    *,
+    model: bool = False,
+    flat: bool = False,
+    array: bool = False,
+) -> Callable[[], Space]:
+    """Return a factory of an empty loops scene."""
+
+    def create() -> Space:
+        return loops.create_scene(size, model=model, flat=flat, array=array)
+
+    return create
+
+
+def automata_space(
+    size: int,
+    *,
+    model: bool = False,
+    array: bool = False,
+) -> Callable[[], Space]:
+    """Return a factory of an empty automata scene, seeded at the center."""
+
+    def create() -> Space:
+        return automata.create_scene((size, size), model=model, array=array)
+
+    return create
+
+
+WORKLOADS: dict[str, Callable[[], Space]] = {
+    **{f"sudoku_{name}": sudoku_space(name) for name in ("medium", "hard", "expert")},
+    **{f"loops_{size}": loops_space(size) for size in LOOPS_SIZES},
+    **{f"automata_{size}": automata_space(size) for size in AUTOMATA_SIZES},
+    **{
+        f"model_sudoku_{name}": sudoku_space(name, model=True)
+        for name in ("medium", "hard", "expert")
+    },
+    **{f"model_loops_{size}": loops_space(size, model=True) for size in LOOPS_SIZES},
+    **{
+        f"model_automata_{size}": automata_space(size, model=True)
+        for size in AUTOMATA_SIZES
+    },
+    **{f"flat_loops_{size}": loops_space(size, flat=True) for size in LOOPS_SIZES},
+    **{f"array_loops_{size}": loops_space(size, array=True) for size in LOOPS_SIZES},
+    **{
+        f"array_automata_{size}": automata_space(size, array=True)
+        for size in AUTOMATA_SIZES
+    },
+}
+SCALING: dict[str, Callable[[], Space]] = {
+    "count_loops_7": loops_space(7),
+    "count_automata_6": automata_space(6),
+}
+STARTUP: dict[str, list[str]] = {
+    "startup_sudoku_mini": ["run", "sudoku_mini", "data/sudoku/medium.txt"],
+    "startup_loops": ["run", "loops", "--headless", "--size", "5"],
+    "startup_automata": ["run", "automata", "--headless", "--size", "5"],
+}
+
+
+def measure(name: str) -> Measurement:
+    """Solve a single workload in this process and return its measurements."""
+    random.seed(SEED)
+    space = WORKLOADS[name]()
+    space.start_trail()
+    stats = Stats()
+    start = time.perf_counter()
+    solved = solve_space(space, stats=stats)
+    elapsed = time.perf_counter() - start
+    return {
+        "solved": solved,
+        "time": elapsed,
+        "nodes_per_sec": stats.nodes / elapsed if elapsed else 0.0,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "stats": stats.as_dict(),
+    }
+
+
+def measure_startup(name: str) -> Measurement:
+    """Run a startup command line and return its measurements."""
+    start = time.perf_counter()
+    process = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", *STARTUP[name]],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd=ROOT,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    return {
+        "solved": os.waitstatus_to_exitcode(status) == 0,
+        "time": elapsed,
+        "nodes_per_sec": 0.0,
+        "peak_rss_kb": usage.ru_maxrss,
+        "stats": {},
+    }
+
+
+def run_workload(name: str) -> Measurement:
+    """Run a workload once in a fresh subprocess."""
+    if name in STARTUP:
+        return measure_startup(name)
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "bench", "--workload", name],
+        capture_output=True,
+        check=True,
+        text=True,
+        cwd=ROOT,
+    ).stdout
+    result: Measurement = json.loads(output)
+    return result
+
+
+def run_workloads(names: list[str], repeat: int) -> dict[str, Measurement]:
+    """Run every workload repeat times, keeping the fastest run of each.
+
+    Runs are interleaved, one round over all workloads at a time, so a burst of
+    load on the machine slows down a single run of a workload, not all of them.
+    """
+    best: dict[str, Measurement] = {}
+    for _ in range(repeat):
+        for name in names:
+            result = run_workload(name)
+            if name not in best or result["time"] < best[name]["time"]:
+                best[name] = result
+    return best
+
+
+def worker_counts(most: int) -> list[int]:
+    """Return 1, 2, 4 and so on workers, up to and including most."""
+    counts = [1]
+    while counts[-1] * 2 < most:
+        counts.append(counts[-1] * 2)
+    return [*counts, most] if most > 1 else counts
+
+
+def measure_scaling(name: str, workers: int) -> tuple[int, float]:
+    """Count the solutions of a workload in parallel, returning count and time."""
+    random.seed(SEED)
+    space = SCALING[name]()
+    space.start_trail()
+    start = time.perf_counter()
+    _, found = solve_parallel(space, workers, counting=True, seed=SEED)
+    return found, time.perf_counter() - start
+
+
+def run_scaling(names: list[str], most: int, repeat: int) -> bool:
+    """Print the speedup of parallel counting over a single worker.
+
+    Returns False if any number of workers finds a different count.
+    """
+    ok = True
+    for name in names:
+        expected, single = 0, 0.0
+        for workers in worker_counts(most):
+            runs = [measure_scaling(name, workers) for _ in range(repeat)]
+            found = runs[0][0]
+            elapsed = min(elapsed for _, elapsed in runs)
+            expected, single = expected or found, single or elapsed
+            mismatch = any(count != expected for count, _ in runs)
+            ok = ok and not mismatch
+            sys.stdout.write(
+                f"{name:20} {workers:3d} workers {elapsed:9.4f}s"
+                f" {single / elapsed:6.2f}x {found:8d} solutions"
+                f"{'  MISMATCH' if mismatch else ''}\n",
+            )
+    return ok
+
+
+def regressions(result: Measurement, base: Measurement) -> list[str]:
+    """Return how a workload regressed against its baseline, if at all.
+
+    Times only count as a regression if slower by both THRESHOLD and
+    TIME_FLOOR seconds, as a few milliseconds are within noise of the fastest
+    run. Node counts are deterministic for a fixed seed, so any increase is a
+    change to the search, whatever the timing noise.
+    """
+    found = []
+    elapsed = result["time"] - base["time"]
+    if elapsed > TIME_FLOOR and result["time"] > base["time"] * (1 + THRESHOLD):
+        found.append("time")
+    if result["stats"].get("nodes", 0) > base["stats"].get("nodes", 0):
+        found.append("nodes")
+    if base["solved"] and not result["solved"]:
+        found.append("unsolved")
+    return found
+
+
+def compare(results: dict[str, Measurement], baseline_path: Path) -> bool:
+    """Print time and node ratios against a baseline, True if none regressed."""
+    with baseline_path.open() as f:
+        baseline = json.load(f)["workloads"]
+    ok = True
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        ratio = result["time"] / base["time"]
+        nodes = result["stats"].get("nodes", 0)
+        base_nodes = base["stats"].get("nodes", 0)
+        found = regressions(result, base)
+        ok = ok and not found
+        sys.stdout.write(
+            f"{name:20} {ratio:6.2f}x {base_nodes:8d} -> {nodes:8d} nodes"
+            f"{'  REGRESSION: ' + ', '.join(found) if found else ''}\n",
+        )
+    return ok
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--workload", help="measure a single workload, print JSON")
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="only run workloads whose name contains this text",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=REPEAT,
+        help="runs per workload, keeping the fastest",
+    )
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare to")
+    parser.add_argument(
+        "--scaling",
+        type=int,
+        metavar="WORKERS",
+        help="count solutions in parallel with 1, 2, 4 ... up to WORKERS processes",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    """Run the benchmarks selected by the arguments."""
+    if args.workload is not None:
+        sys.stdout.write(json.dumps(measure(args.workload)))
+        return
+    if args.scaling is not None:
+        names = [name for name in SCALING if args.filter in name]
+        if not run_scaling(names, args.scaling, args.repeat):
+            sys.exit(1)
+        return
+    names = [name for name in [*WORKLOADS, *STARTUP] if args.filter in name]
+    results = run_workloads(names, args.repeat)
+    for name, result in results.items():
+        sys.stdout.write(
+            f"{name:20} {result['time']:9.4f}s"
+            f" {result['nodes_per_sec']:10.1f} nodes/s"
+            f" {result['peak_rss_kb']:8d}KB"
+            f"{'' if result['solved'] else '  UNSOLVED'}\n",
+        )
+    if args.output is not None:
+        with args.output.open("w") as f:
+            json.dump(
+                {"python": platform.python_version(), "workloads": results},
+                f,
+                indent=2,
+            )
+    if args.compare is not None and not compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -1,28 +1,525 @@
-"""Run solvers."""
+"""Run solvers.
 
+Scripts are imported on demand, so headless scripts never import pygame.
+"""
+
+import argparse
 import sys
 from pathlib import Path
 
-import src.automata
-import src.loops
-import src.sudoku
-import src.sudoku_mini
+from src.heuristics import VALUE_ORDERS, VARIABLE_ORDERS
+from src.scheduler import QUEUE_ORDERS
+from src.solver import Config, Restarts
+from src.stats import Stats
 
-SECOND = 2
+SCRIPTS = (
+    "sudoku",
+    "sudoku_mini",
+    "sudoku_bits",
+    "sudoku_batch",
+    "loops",
+    "automata",
+)
+PLANES = ("loops", "automata")
+SEARCHES = ("sudoku", "sudoku_mini", "sudoku_batch", *PLANES)
+SCRIPT_OPTIONS: dict[str, tuple[str, ...]] = {
+    "headless": PLANES,
+    "binary": PLANES,
+    "size": PLANES,
+    "seed": PLANES,
+    "portfolio": PLANES,
+    "parallel": PLANES,
+    "array": PLANES,
+    "workers": PLANES,
+    "count": (*PLANES, "sudoku_mini"),
+    "solutions": (*PLANES, "sudoku_mini"),
+    "model": (*PLANES, "sudoku_mini"),
+    "flat": ("loops",),
+    "tile": ("loops",),
+    "rule": ("automata",),
+    "sweep": ("automata",),
+    "window": ("automata",),
+    "rows": ("automata",),
+    "rules": ("sudoku", "sudoku_mini", "sudoku_batch"),
+    "fps": ("sudoku", *PLANES),
+    "restarts": SEARCHES,
+    "restart_schedule": SEARCHES,
+    "restart_factor": SEARCHES,
+    "restart_unit": SEARCHES,
+    "backjump": SEARCHES,
+    "nogoods": SEARCHES,
+    "table": SEARCHES,
+    "variable_order": SEARCHES,
+    "value_order": SEARCHES,
+    "queue_order": SEARCHES,
+}
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "sudoku":
-            src.sudoku.run(
-                Path(sys.argv[SECOND]) if len(sys.argv) > SECOND else None,
-            )
-        if sys.argv[1] == "sudoku_mini":
-            src.sudoku_mini.run(Path(sys.argv[SECOND]))
-        elif sys.argv[1] == "loops":
-            src.loops.run()
-        elif sys.argv[1] == "automata":
-            src.automata.run()
+
+def positive_number(text: str) -> int:
+    """Return the number in the text, checking it is at least 1."""
+    number = int(text)
+    if number < 1:
+        message = f"must be at least 1, got {number}"
+        raise argparse.ArgumentTypeError(message)
+    return number
+
+
+def rule_number(text: str) -> int:
+    """Return the elementary rule number in the text, checking its range."""
+    rule = int(text)
+    if not 0 <= rule < 256:  # noqa: PLR2004
+        message = f"rule must be 0 to 255, got {rule}"
+        raise argparse.ArgumentTypeError(message)
+    return rule
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog="python -m run", description=__doc__)
+    parser.add_argument("script", choices=SCRIPTS)
+    parser.add_argument("args", nargs="*", help="script arguments, e.g. a filename")
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print solver statistics to stderr",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="solve loops or automata without a window, writing the grid to stdout",
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="write the headless grid as binary dump instead of text",
+    )
+    parser.add_argument(
+        "--size",
+        type=positive_number,
+        help="grid size of loops or automata",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="random seed of loops or automata, e.g. to replay a portfolio winner",
+    )
+    parser.add_argument(
+        "--portfolio",
+        type=int,
+        default=0,
+        metavar="N",
+        help="solve headless with N seeds in parallel, taking the first solution",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=0,
+        metavar="N",
+        help="solve headless with N processes sharing branches of one search",
+    )
+    parser.add_argument(
+        "--restarts",
+        type=int,
+        metavar="BUDGET",
+        help="restart the search after a budget that grows from BUDGET",
+    )
+    parser.add_argument(
+        "--restart-schedule",
+        choices=Restarts.SCHEDULES,
+        default="luby",
+        help="how the restart budget grows",
+    )
+    parser.add_argument(
+        "--restart-factor",
+        type=float,
+        default=1.5,
+        help="growth factor of the geometric restart schedule",
+    )
+    parser.add_argument(
+        "--restart-unit",
+        choices=Restarts.UNITS,
+        default="backtracks",
+        help="what the restart budget counts",
+    )
+    parser.add_argument(
+        "--solutions",
+        type=int,
+        metavar="N",
+        help="write up to N solutions, or with --count stop counting at N",
+    )
+    parser.add_argument(
+        "--count",
+        action="store_true",
+        help="count solutions of loops, automata or sudoku_mini",
+    )
+    parser.add_argument(
+        "--backjump",
+        action="store_true",
+        help="jump back to the decisions that caused a conflict",
+    )
+    parser.add_argument(
+        "--nogoods",
+        type=int,
+        default=0,
+        metavar="LIMIT",
+        help="learn up to LIMIT nogoods from conflicts, implies --backjump",
+    )
+    parser.add_argument(
+        "--table",
+        type=int,
+        default=0,
+        metavar="SIZE",
+        help="remember up to SIZE hashes of spaces without a solution",
+    )
+    parser.add_argument(
+        "--rules",
+        default="",
+        metavar="NAMES",
+        help="comma separated sudoku inference rules, or 'all'",
+    )
+    parser.add_argument(
+        "--model",
+        action="store_true",
+        help="solve loops, automata or sudoku_mini from a compiled constraint model",
+    )
+    parser.add_argument(
+        "--flat",
+        action="store_true",
+        help="solve loops in a space indexed by integer cell ids",
+    )
+    parser.add_argument(
+        "--array",
+        action="store_true",
+        help="solve loops or automata in a space stored as one NumPy array",
+    )
+    parser.add_argument(
+        "--rule",
+        type=rule_number,
+        default=30,
+        help="elementary cellular automaton rule of automata, 0 to 255",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="solve automata headless for all 256 rules, reporting nodes and time",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help="processes of the rule sweep or tiled loops, one per CPU by default",
+    )
+    parser.add_argument(
+        "--tile",
+        type=positive_number,
+        metavar="SIZE",
+        help="solve loops headless in tiles of SIZE, streaming them to stdout",
+    )
+    parser.add_argument(
+        "--window",
+        type=positive_number,
+        metavar="ROWS",
+        help="solve automata headless row by row in a sliding window of ROWS",
+    )
+    parser.add_argument(
+        "--rows",
+        type=positive_number,
+        help="rows of automata in window mode, the grid size by default",
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        help="frames per second of the animation, the solver is not slowed down",
+    )
+    parser.add_argument(
+        "--variable-order",
+        choices=VARIABLE_ORDERS,
+        default="mrv",
+        help="how to select the position to branch on",
+    )
+    parser.add_argument(
+        "--value-order",
+        choices=VALUE_ORDERS,
+        default="random",
+        help="in which order to try the states of a position",
+    )
+    parser.add_argument(
+        "--queue-order",
+        choices=QUEUE_ORDERS,
+        default="fifo",
+        help="in which order to propagate changed positions",
+    )
+    args = parser.parse_args()
+    check_args(parser, args)
+    return args
+
+
+def check_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Exit with a usage error on options that do not apply or do not combine."""
+    for name, scripts in SCRIPT_OPTIONS.items():
+        if args.script not in scripts and given(parser, args, name):
+            parser.error(f"{option(name)} applies to {listing(scripts)} only")
+    modes = [
+        option(name)
+        for name in ("tile", "window", "sweep", "count", "solutions")
+        if given(parser, args, name)
+    ]
+    if "--count" in modes and "--solutions" in modes:
+        modes.remove("--solutions")
+    if len(modes) > 1:
+        parser.error(f"{modes[0]} does not combine with {modes[1]}")
+    if args.flat and args.model:
+        parser.error("--flat does not combine with --model")
+    if args.rows is not None and not args.window:
+        parser.error("--rows needs --window")
+    if args.workers and not (args.tile or args.sweep):
+        parser.error("--workers needs --tile or --sweep")
+    if args.binary and (args.count or not (args.headless or args.solutions)):
+        parser.error("--binary needs --headless or --solutions, without --count")
+    if args.fps is not None and (args.headless or modes):
+        parser.error("--fps applies to the animation only")
+    check_array(parser, args)
+    check_searches(parser, args)
+
+
+def given(parser: argparse.ArgumentParser, args: argparse.Namespace, name: str) -> bool:
+    """Return True if the option differs from its default."""
+    return bool(getattr(args, name) != parser.get_default(name))
+
+
+def option(name: str) -> str:
+    """Return the command line option of an argument name."""
+    return "--" + name.replace("_", "-")
+
+
+def listing(names: tuple[str, ...]) -> str:
+    """Return the names as readable list, e.g. 'a, b and c'."""
+    return " and ".join([", ".join(names[:-1]), names[-1]] if names[1:] else names)
+
+
+def check_array(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Exit with a usage error if --array is given to a mode without arrays."""
+    if not args.array:
+        return
+    for name in ("model", "flat", "tile", "window", "sweep"):
+        if getattr(args, name):
+            parser.error(f"--array does not combine with {option(name)}")
+
+
+def check_searches(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Exit with a usage error if --parallel or --portfolio cannot be used."""
+    searches = (
+        "--parallel" if args.parallel else "--portfolio" if args.portfolio else ""
+    )
+    if not searches:
+        return
+    if args.parallel and args.portfolio:
+        parser.error("--parallel and --portfolio exclude each other")
+    for name in ("tile", "window", "sweep"):
+        if getattr(args, name):
+            parser.error(f"{searches} does not combine with {option(name)}")
+    if args.count or args.solutions:
+        if args.portfolio:
+            parser.error("--portfolio does not combine with --count or --solutions")
+        if args.solutions:
+            parser.error("--parallel does not combine with --solutions")
+    elif not args.headless:
+        parser.error(f"{searches} needs --headless or --count")
+
+
+def parse_rules(text: str) -> tuple[str, ...]:
+    """Return the names of the sudoku inference rules selected by the text."""
+    if not text:
+        return ()
+    from src.sudoku_rules import RULES
+
+    if text == "all":
+        return tuple(RULES)
+    names = tuple(text.split(","))
+    for name in names:
+        if name not in RULES:
+            sys.stderr.write(f"Unknown rule: {name}, expected one of {list(RULES)}\n")
+            sys.exit(2)
+    return names
+
+
+def parse_config(args: argparse.Namespace) -> Config:
+    """Return the search configuration selected by the arguments."""
+    restarts = (
+        Restarts(
+            args.restarts,
+            args.restart_schedule,
+            args.restart_factor,
+            args.restart_unit,
+        )
+        if args.restarts
+        else None
+    )
+    return Config(
+        restarts=restarts,
+        backjump=args.backjump,
+        nogoods=args.nogoods,
+        table=args.table,
+        rules=parse_rules(args.rules),
+        variable=args.variable_order,
+        value=args.value_order,
+        queue=args.queue_order,
+    )
+
+
+def run_plane(args: argparse.Namespace, stats: Stats | None, config: Config) -> None:
+    """Run the loops or automata script."""
+    if args.script == "loops":
+        from src import loops
+
+        if args.count or args.solutions:
+            loops.run_solutions(
+                stats,
+                args.size or loops.GRID_SIZE,
+                limit=args.solutions,
+                count=args.count,
+                binary=args.binary,
+                seed=args.seed,
+                config=config,
+                model=args.model,
+                parallel=args.parallel,
+                flat=args.flat,
+                array=args.array,
+            )
+        elif args.tile:
+            loops.run_tiled(
+                stats,
+                args.size or loops.GRID_SIZE,
+                args.tile,
+                workers=args.workers,
+                seed=args.seed,
+                config=config,
+                model=args.model,
+                flat=args.flat,
+            )
+        elif not args.headless:
+            loops.run(
+                stats,
+                args.seed,
+                config,
+                model=args.model,
+                flat=args.flat,
+                array=args.array,
+                fps=args.fps or loops.FRAME_RATE,
+            )
         else:
-            sys.stderr.write(f"Unknown script: {sys.argv[1]}\n")
+            loops.run_headless(
+                stats,
+                args.size or loops.GRID_SIZE,
+                binary=args.binary,
+                seed=args.seed,
+                portfolio=args.portfolio,
+                parallel=args.parallel,
+                config=config,
+                model=args.model,
+                flat=args.flat,
+                array=args.array,
+            )
     else:
-        sys.stderr.write("Usage: python -m src.run <script> [args]\n")
+        from src import automata
+
+        if args.sweep:
+            automata.run_sweep(
+                stats,
+                (args.size, args.size) if args.size else automata.GRID_SIZE,
+                workers=args.workers,
+                seed=args.seed,
+                config=config,
+                model=args.model,
+            )
+        elif args.window:
+            width, height = (args.size, args.size) if args.size else automata.GRID_SIZE
+            automata.run_window(
+                stats,
+                width,
+                args.rows or height,
+                window=args.window,
+                seed=args.seed,
+                config=config,
+                model=args.model,
+                rule=args.rule,
+            )
+        elif args.count or args.solutions:
+            automata.run_solutions(
+                stats,
+                (args.size, args.size) if args.size else automata.GRID_SIZE,
+                limit=args.solutions,
+                count=args.count,
+                binary=args.binary,
+                seed=args.seed,
+                config=config,
+                model=args.model,
+                parallel=args.parallel,
+                rule=args.rule,
+                array=args.array,
+            )
+        elif not args.headless:
+            automata.run(
+                stats,
+                args.seed,
+                config,
+                model=args.model,
+                rule=args.rule,
+                array=args.array,
+                fps=args.fps or automata.FRAME_RATE,
+            )
+        else:
+            automata.run_headless(
+                stats,
+                (args.size, args.size) if args.size else automata.GRID_SIZE,
+                binary=args.binary,
+                seed=args.seed,
+                portfolio=args.portfolio,
+                parallel=args.parallel,
+                config=config,
+                model=args.model,
+                rule=args.rule,
+            )
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the script selected by the arguments."""
+    stats = Stats() if args.stats else None
+    config = parse_config(args)
+    filename = Path(args.args[0]) if args.args else None
+    if args.script == "sudoku":
+        from src import sudoku
+
+        sudoku.run(filename, stats, config, fps=args.fps or sudoku.FRAME_RATE)
+    elif args.script in ("loops", "automata"):
+        run_plane(args, stats, config)
+    elif filename is None:
+        sys.stderr.write(f"Missing filename for script: {args.script}\n")
+        sys.exit(2)
+    elif args.script == "sudoku_mini":
+        from src import sudoku_mini
+
+        sudoku_mini.run(
+            filename,
+            stats,
+            config,
+            count=args.count,
+            limit=args.solutions,
+            model=args.model,
+        )
+    elif args.script == "sudoku_bits":
+        from src import sudoku_bits
+
+        sudoku_bits.run(filename, stats)
+    elif args.script == "sudoku_batch":
+        from src import sudoku_batch
+
+        sudoku_batch.run(filename, stats, config)
+    if stats is not None:
+        sys.stderr.write(f"{stats}\n")
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,306 @@
+"""Spaces backed by a single NumPy array.
+
+Array-backed variants of the loops and automata scenes are defined here too, so
+scripts that do not ask for them never import NumPy.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Iterator, cast
+
+import numpy as np
+import numpy.typing as npt
+
+from src import automata, loops
+from src.position import Position, PositionState
+from src.scheduler import PropagationQueue
+from src.space import (
+    DUMP_HEADER,
+    UNSOLVED_BYTE,
+    Edge,
+    Space,
+    SpaceIndex,
+    state_mask,
+)
+
+if TYPE_CHECKING:
+    from src.pygame import pygame
+
+MAX_COUNT = 64
+Grid = npt.NDArray[np.uint64]
+
+
+class ArrayPosition(Position):
+    """View of a single position in an array space.
+
+    The states are stored as a bitmask in the array of the space, this object
+    only holds the coordinates. Views read the array of their space, so they
+    stay valid when another array is assigned to the space.
+    """
+
+    __slots__ = ("space", "x", "y")
+
+    space: ArrayPlanarSpace
+    x: int
+    y: int
+
+    def __init__(self: ArrayPosition, space: ArrayPlanarSpace, x: int, y: int) -> None:
+        """Create a view of the position at (x, y) in the given space."""
+        self.space = space
+        self.x = x
+        self.y = y
+
+    @property
+    def mask(self: ArrayPosition) -> int:
+        """Bitmask of the states this position could be in."""
+        return self.space.grid.item(self.y, self.x)
+
+    @mask.setter
+    def mask(self: ArrayPosition, mask: int) -> None:
+        self.space.grid[self.y, self.x] = mask
+
+    def copy(self: ArrayPosition) -> ArrayPosition:
+        """Return a view of the same position."""
+        return ArrayPosition(self.space, self.x, self.y)
+
+    @property
+    def count(self: ArrayPosition) -> int:
+        """Number of states this position could be in."""
+        return self.mask.bit_count()
+
+    @property
+    def is_solved(self: ArrayPosition) -> bool:
+        """True if can only be in one state."""
+        return self.mask.bit_count() == 1
+
+    def has(self: ArrayPosition, state: PositionState) -> bool:
+        """Return true if can be in the given state."""
+        return bool(self.mask >> cast(int, state) & 1)
+
+    def remove(self: ArrayPosition, states: Iterable[PositionState]) -> None:
+        """Remove the given states from the position."""
+        self.remove_mask(state_mask(states))
+
+    def remove_mask(self: ArrayPosition, mask: int) -> None:
+        """Remove all states set in the given mask from the position."""
+        self.mask &= ~mask
+
+    def solve(self: ArrayPosition, state: PositionState) -> None:
+        """Remove all but one state from the position."""
+        self.mask &= 1 << cast(int, state)
+
+    @property
+    def state(self: ArrayPosition) -> int:
+        """Single state, assuming solved."""
+        return self.mask.bit_length() - 1
+
+    @property
+    def states(self: ArrayPosition) -> Iterator[int]:
+        """All possible states."""
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def save(self: ArrayPosition) -> int:
+        """Return an opaque snapshot of the current states."""
+        return self.mask
+
+    def restore(self: ArrayPosition, saved: object) -> None:
+        """Restore the states from a snapshot returned by `save`."""
+        self.mask = cast(int, saved)
+
+    def __str__(self: ArrayPosition) -> str:
+        """Return a string representation of this position."""
+        return str(self.state + 1) if self.is_solved else " "
+
+
+class ArrayPlanarSpace(Space):
+    """A 2D space stored as one (height, width) array of state bitmasks.
+
+    Drop-in alternative to `PlanarSpace`: `get` and `matrix` return position
+    views, so existing subclasses keep working when mixed in before it. The
+    views are created on first use and kept, so reading a position costs one
+    array lookup. Copying is a single buffer copy, and `counts`,
+    `solved_states` and `is_complete` give vectorized access to the whole grid
+    for validity checks and drawing.
+    """
+
+    grid: Grid
+    views: list[list[ArrayPosition]] | None
+
+    def __init__(  # noqa: PLR0913
+        self: ArrayPlanarSpace,
+        grid: Grid | None = None,
+        queue: PropagationQueue | None = None,
+        edge: Edge | None = None,
+        count: int = 0,
+        size: tuple[int, int] = (0, 0),
+    ) -> None:
+        """Create a space with the given grid or size."""
+        if count > MAX_COUNT:
+            raise ValueError
+        self.grid = (
+            np.full((size[1], size[0]), (1 << count) - 1, dtype=np.uint64)
+            if grid is None
+            else grid
+        )
+        self.queue = PropagationQueue() if queue is None else queue
+        self.edge = Edge() if edge is None else edge
+        self.views = None
+
+    def __getstate__(self: ArrayPlanarSpace) -> dict[str, object]:
+        """Return the attributes to pickle, leaving out the position views."""
+        state = self.__dict__.copy()
+        state["views"] = None
+        return state
+
+    def copy(self: ArrayPlanarSpace) -> ArrayPlanarSpace:
+        """Return a deep copy of this space."""
+        return self.__class__(
+            grid=self.grid.copy(),
+            queue=self.queue.copy(),
+            edge=self.edge.copy(),
+        )
+
+    def assign(self: ArrayPlanarSpace, right: Space) -> None:
+        """Assign the given space to this space."""
+        if not isinstance(right, ArrayPlanarSpace):
+            raise TypeError
+        if right.grid.shape != self.grid.shape:
+            self.views = None
+        self.grid = right.grid
+        self.queue = right.queue
+        self.edge = right.edge
+
+    @property
+    def size(self: ArrayPlanarSpace) -> tuple[int, int]:
+        """Width and height of the space."""
+        height, width = self.grid.shape
+        return (width, height)
+
+    @property
+    def matrix(self: ArrayPlanarSpace) -> list[list[ArrayPosition]]:
+        """Rows of position views, mirroring `PlanarSpace.matrix`."""
+        views = self.views
+        if views is None:
+            height, width = self.grid.shape
+            views = [
+                [ArrayPosition(self, x, y) for x in range(width)] for y in range(height)
+            ]
+            self.views = views
+        return views
+
+    @property
+    def positions(
+        self: ArrayPlanarSpace,
+    ) -> Iterator[tuple[tuple[int, int], Position]]:
+        """Iterator over all index-positions pairs in the space."""
+        return (
+            ((x, y), position)
+            for y, row in enumerate(self.matrix)
+            for x, position in enumerate(row)
+        )
+
+    def get(self: ArrayPlanarSpace, index: SpaceIndex) -> ArrayPosition:
+        """Return a view of the position at the given index."""
+        x, y = cast(tuple[int, int], index)
+        return self.matrix[y][x]
+
+    def remove(
+        self: ArrayPlanarSpace,
+        index: SpaceIndex,
+        states: Iterable[PositionState],
+    ) -> bool:
+        """Remove the given states from the position at the given index."""
+        return self.remove_mask(index, state_mask(states))
+
+    def remove_mask(self: ArrayPlanarSpace, index: SpaceIndex, mask: int) -> bool:
+        """Remove all states set in the mask from the position at the given index.
+
+        Returns False if this would leave the position without any state.
+        """
+        position = self.get(index)
+        current = position.mask
+        hit = current & mask
+        if not hit:
+            return True
+        if hit == current:
+            return self.blame(index)
+        self.record(index, position)
+        if self.zobrist is not None:
+            self.hash ^= self.zobrist.delta(index, hit)
+        position.mask = current & ~hit
+        self.reduced(index, position)
+        return True
+
+    def counts(self: ArrayPlanarSpace) -> npt.NDArray[np.uint8]:
+        """Return the number of states of every position."""
+        return np.bitwise_count(self.grid)
+
+    def solved_states(self: ArrayPlanarSpace) -> npt.NDArray[np.int64]:
+        """Return the state of every solved position, or -1 if unsolved."""
+        states = np.full(self.grid.shape, -1, dtype=np.int64)
+        solved = self.counts() == 1
+        states[solved] = np.log2(self.grid[solved]).astype(np.int64)
+        return states
+
+    def edge_mask(self: ArrayPlanarSpace) -> npt.NDArray[np.bool_]:
+        """Return True for every position in the edge."""
+        marked = np.zeros(self.grid.shape, dtype=np.bool_)
+        if self.edge:
+            xs, ys = zip(*cast(Iterable[tuple[int, int]], self.edge))
+            marked[ys, xs] = True
+        return marked
+
+    def dump(self: ArrayPlanarSpace) -> bytes:
+        """Return width and height, followed by one state byte per position.
+
+        Positions are listed row by row, unsolved positions as 255.
+        """
+        states = self.solved_states()
+        states[states < 0] = UNSOLVED_BYTE
+        return DUMP_HEADER.pack(*self.size) + states.astype(np.uint8).tobytes()
+
+    @property
+    def is_complete(self: ArrayPlanarSpace) -> bool:
+        """True if all positions are solved."""
+        return bool((self.counts() == 1).all())
+
+
+class LoopsScene(ArrayPlanarSpace, loops.Scene):  # type: ignore[misc]
+    """Loops scene stored in an array, checked with whole-grid operations."""
+
+    @property
+    def is_valid(self: LoopsScene) -> bool:
+        """True if all positions are solved and all neighbors connect."""
+        states = self.solved_states()
+        if (states < 0).any():
+            return False
+        across = states <= 1
+        along = (states == 0) | (states == 3)  # noqa: PLR2004
+        return bool(
+            (across[:, :-1] != across[:, 1:]).all()
+            and (along[:-1] != along[1:]).all(),
+        )
+
+
+class AutomataScene(ArrayPlanarSpace, automata.Scene):  # type: ignore[misc]
+    """Automata scene stored in an array, drawn in a single blit."""
+
+    def copy(self: AutomataScene) -> AutomataScene:
+        """Return a deep copy of this scene."""
+        return cast(AutomataScene, super().copy())
+
+    def draw(self: AutomataScene, surface: pygame.Surface) -> None:
+        """Draw one pixel per position, colored by its state."""
+        from src.pygame import pygame
+
+        states = self.solved_states()
+        image = np.empty((*states.shape, 3), dtype=np.uint8)
+        image[...] = automata.COLOR_1
+        image[states == 0] = automata.COLOR_0
+        image[states < 0] = automata.UNSOLVED_COLOR
+        image[self.edge_mask()] = automata.EDGE_COLOR
+        pygame.surfarray.blit_array(surface, image.swapaxes(0, 1))
@@ -2,17 +2,31 @@
 
 from __future__ import annotations
 
+import multiprocessing
 import random
-from typing import cast
+import sys
+import time
+from functools import cache, partial
+from itertools import product
+from typing import TYPE_CHECKING, Iterable, cast
 
-from src.position import DiscretePosition
-from src.pygame import pygame
-from src.solver import solve_space
+from src.headless import solve_scene, write_scene, write_solutions
+from src.model import Model, ModelSpace
+from src.solver import Config, Search, solve_space
 from src.space import PlanarSpace, SpaceIndex
-from src.utils import await_key, flush_surface, setup_surface
+from src.stats import Stats
 
-FRAME_DELAY = 0.01
+if TYPE_CHECKING:
+    from src.position import Position
+    from src.pygame import pygame
+
+FRAME_RATE = 100
 STATE_COUNT = 6
+MODEL_STATE_COUNT = 2
+RULE = 30
+RULE_COUNT = 256
+SWEEP_NODES = 10000
+WINDOW_ROWS = 16
 GRID_SIZE = (100, 100)
 DRAW_SCALE = 0.2
 COLOR_0 = (255, 255, 255)
@@ -20,17 +34,6 @@ COLOR_1 = (0, 0, 0)
 UNSOLVED_COLOR = (128, 128, 128)
 EDGE_COLOR = (255, 128, 0)
 
-rule30 = [
-    (1, 1, 1, 0),
-    (1, 1, 0, 0),
-    (1, 0, 1, 0),
-    (1, 0, 0, 1),
-    (0, 1, 1, 1),
-    (0, 1, 0, 1),
-    (0, 0, 1, 1),
-    (0, 0, 0, 0),
-]
-
 rule_offset = [
     (-1, -1),
     (0, -1),
@@ -38,61 +41,142 @@ rule_offset = [
     (0, 0),
 ]
 
+scope_offset = sorted(
+    {
+        (off[0] - offset[0], off[1] - offset[1])
+        for offset in rule_offset
+        for off in rule_offset
+    },
+)
+
+windows = [
+    tuple((off[0] - offset[0], off[1] - offset[1]) for off in rule_offset)
+    for offset in rule_offset
+]
+
 UNSET = 2
 UNSOLVED = 3
-EMPTY_POSITION = DiscretePosition(size=STATE_COUNT)
+UNKNOWN = 2
+INVALID = 3
+CODE_BITS = 2
+
+Rule = list[tuple[int, int, int, int]]
+Actions = tuple[tuple[int, int], ...]
 
 
-def in_bounds(index: SpaceIndex) -> bool:
-    x, y = cast(tuple[int, int], index)
-    return x >= 0 and x <= GRID_SIZE[0] - 1 and y >= 0 and y <= GRID_SIZE[1] - 1
+def rule_rows(rule: int) -> Rule:
+    return [
+        (left, center, right, rule >> (left << 2 | center << 1 | right) & 1)
+        for left, center, right in product((1, 0), repeat=3)
+    ]
+
+
+@cache
+def compile_rule(rule: int) -> tuple[Actions | None, ...]:
+    """Return the actions of every window of known and unknown cells.
+
+    A window is keyed by a 2-bit code per cell: its solved state, UNKNOWN, or
+    INVALID for cells solved to a marker state. The entry is None if no row of
+    the rule matches, otherwise the cells to solve, or to remove the marker of
+    if rows disagree on their state.
+    """
+    rows = rule_rows(rule)
+    lookup: list[Actions | None] = []
+    for codes in product(range(1 << CODE_BITS), repeat=len(rule_offset)):
+        states = [None if code == UNKNOWN else code for code in codes]
+        solves = [UNSET] * len(rule_offset)
+        found = False
+        for row in rows:
+            if all(state is None or state == part for state, part in zip(states, row)):
+                found = True
+                solves = [
+                    solve
+                    if state is not None
+                    else part
+                    if solve in (UNSET, part)
+                    else UNSOLVED
+                    for state, part, solve in zip(states, row, solves)
+                ]
+        lookup.append(
+            tuple((i, solve) for i, solve in enumerate(solves) if solve != UNSET)
+            if found
+            else None,
+        )
+    return tuple(lookup)
 
 
 class Scene(PlanarSpace):
+    rule: int = RULE
+
+    def copy(self: Scene) -> Scene:
+        scene = cast(Scene, super().copy())
+        scene.rule = self.rule
+        return scene
+
+    def in_bounds(self: Scene, index: SpaceIndex) -> bool:
+        x, y = cast(tuple[int, int], index)
+        width, height = self.size
+        return x >= 0 and x <= width - 1 and y >= 0 and y <= height - 1
+
+    def scope(self: Scene, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        x, y = cast(tuple[int, int], index)
+        return [
+            (x + dx, y + dy)
+            for dx, dy in scope_offset
+            if self.in_bounds((x + dx, y + dy))
+        ]
+
+    def neighbors(self: Scene, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        return [other for other in self.scope(index) if other != index]
+
+    def window_key(
+        self: Scene,
+        x: int,
+        y: int,
+        window: tuple[tuple[int, int], ...],
+    ) -> int:
+        width, height = self.size
+        matrix = self.matrix
+        key = 0
+        for dx, dy in window:
+            code = UNKNOWN
+            if 0 <= x + dx < width and 0 <= y + dy < height:
+                mask = matrix[y + dy][x + dx].mask
+                if not mask & (mask - 1):
+                    state = mask.bit_length() - 1
+                    code = state if state <= 1 else INVALID
+            key = key << CODE_BITS | code
+        return key
+
     def propagate(self: Scene, index: SpaceIndex) -> bool:
         if self.get(index).state > 1:
             return False
-        current = cast(tuple[int, int], index)
-        for offset in rule_offset:
-            indices = [
-                (current[0] + off[0] - offset[0], current[1] + off[1] - offset[1])
-                for off in rule_offset
-            ]
-            positions = [
-                self.get(idx) if in_bounds(idx) else EMPTY_POSITION for idx in indices
-            ]
-            states = [pos.state if pos.is_solved else None for pos in positions]
-            solves = [UNSET] * 4
-            found = False
-            for rule in rule30:
-                if all(
-                    state is None or state == part for state, part in zip(states, rule)
-                ):
-                    found = True
-                    solves = [
-                        solve
-                        if state is not None
-                        else part
-                        if solve in (UNSET, part)
-                        else UNSOLVED
-                        for state, part, solve in zip(states, rule, solves)
-                    ]
-            if not found:
+        x, y = cast(tuple[int, int], index)
+        width, height = self.size
+        lookup = compile_rule(self.rule)
+        for window in windows:
+            actions = lookup[self.window_key(x, y, window)]
+            if actions is None:
                 return False
-            for i, solve, idx in zip(range(4), solves, indices):
-                if in_bounds(idx):
-                    if solve in (0, 1) and not self.solve(idx, solve):
-                        return False
-                    if solve == UNSOLVED and not self.remove(idx, [2 + i]):
-                        return False
+            for i, solve in actions:
+                xx, yy = x + window[i][0], y + window[i][1]
+                if not (0 <= xx < width and 0 <= yy < height):
+                    continue
+                if not (
+                    self.remove_mask((xx, yy), 1 << (2 + i))
+                    if solve == UNSOLVED
+                    else self.solve((xx, yy), solve)
+                ):
+                    return False
         return True
 
     def draw(
         self: Scene,
         surface: pygame.Surface,
     ) -> None:
-        for y in range(GRID_SIZE[1]):
-            for x in range(GRID_SIZE[0]):
+        width, height = self.size
+        for y in range(height):
+            for x in range(width):
                 position = self.get((x, y))
                 color = (
                     EDGE_COLOR
@@ -105,24 +189,258 @@ class Scene(PlanarSpace):
                 )
                 surface.set_at((x, y), color)
 
+    def __str__(self: Scene) -> str:
+        return "\n".join(
+            "".join(
+                str(position.state) if position.is_solved else " " for position in row
+            )
+            for row in self.matrix
+        )
+
+
+class ModelScene(ModelSpace, Scene):
+    def copy(self: ModelScene) -> ModelScene:
+        return cast(ModelScene, super().copy())
+
+
+class WindowScene(Scene):
+    def add_edge(self: WindowScene, index: SpaceIndex) -> None:
+        """Add the position to the edge, ranked by row first.
+
+        Rows propagate down, so branching on the top unsolved row rarely
+        contradicts the rows below it.
+        """
+        count = self.get(index).count
+        row = cast(tuple[int, int], index)[1]
+        self.edge.add(index, count + row * STATE_COUNT if count > 1 else count)
+
+    def reduced(self: WindowScene, index: SpaceIndex, position: Position) -> None:
+        super().reduced(index, position)
+        if not position.is_solved:
+            self.add_edge(index)
 
-def draw_wait(scene: Scene, window: pygame.Surface, surface: pygame.Surface) -> None:
-    scene.draw(surface)
-    flush_surface(window, surface)
-    await_key(seconds=FRAME_DELAY)
 
+class ModelWindowScene(WindowScene, ModelScene):
+    def copy(self: ModelWindowScene) -> ModelWindowScene:
+        return cast(ModelWindowScene, super().copy())
 
-def run() -> None:
-    random.seed(0)
-    window, surface = setup_surface("Solve Rule 30", GRID_SIZE, DRAW_SCALE)
-    scene = Scene(count=STATE_COUNT, size=GRID_SIZE)
-    scene.edge.add((GRID_SIZE[0] // 2, GRID_SIZE[1] // 2))
+
+def create_model(size: tuple[int, int], rule: int = RULE) -> Model:
+    model = Model(MODEL_STATE_COUNT)
+    rows = rule_rows(rule)
+    for y in range(size[1]):
+        for x in range(size[0]):
+            model.table([(x + dx, y + dy) for dx, dy in rule_offset], rows)
+    return model
+
+
+def create_scene(
+    size: tuple[int, int] = GRID_SIZE,
+    *,
+    model: bool = False,
+    rule: int = RULE,
+    array: bool = False,
+) -> Scene:
+    if model:
+        model_scene = ModelScene(count=MODEL_STATE_COUNT, size=size)
+        model_scene.use_model(create_model(size, rule))
+        scene: Scene = model_scene
+    elif array:
+        from src.array_space import AutomataScene
+
+        scene = AutomataScene(count=STATE_COUNT, size=size)
+    else:
+        scene = Scene(count=STATE_COUNT, size=size)
+    scene.rule = rule
+    scene.add_edge((size[0] // 2, size[1] // 2))
+    return scene
+
+
+def create_window(
+    width: int,
+    depth: int,
+    frozen: list[int] | None,
+    *,
+    model: bool = False,
+    rule: int = RULE,
+) -> Scene:
+    """Create a scene of depth rows below the last frozen row, if any.
+
+    The frozen row is solved into the first row of the scene, so it constrains
+    the rows below without being part of the search.
+    """
+    size = (width, depth + (frozen is not None))
+    if model:
+        model_scene = ModelWindowScene(count=MODEL_STATE_COUNT, size=size)
+        model_scene.use_model(create_model(size, rule))
+        scene: Scene = model_scene
+    else:
+        scene = WindowScene(count=STATE_COUNT, size=size)
+    scene.rule = rule
+    scene.add_edge((width // 2, 0))
+    for x, state in enumerate(frozen or ()):
+        scene.solve((x, 0), state)
+    return scene
+
+
+def run(  # noqa: PLR0913
+    stats: Stats | None = None,
+    seed: int = 0,
+    config: Config | None = None,
+    *,
+    model: bool = False,
+    rule: int = RULE,
+    array: bool = False,
+    fps: float = FRAME_RATE,
+) -> None:
+    from src.pygame import pygame
+    from src.utils import FramePacer, await_key, setup_surface
+
+    random.seed(seed)
+    window, surface = setup_surface(f"Solve Rule {rule}", GRID_SIZE, DRAW_SCALE)
+    scene = create_scene(model=model, rule=rule, array=array)
+    scene.start_trail()
+    pacer = FramePacer(window, surface, fps)
     solved = solve_space(
         scene,
-        lambda s: draw_wait(cast(Scene, s), window, surface),
+        lambda s: pacer.sample(cast(Scene, s).draw),
+        stats,
+        config,
     )
     pygame.display.set_caption(
         ("SOLVED" if solved else "UNSOLVED") + " (ESC to exit)",
     )
-    draw_wait(scene, window, surface)
+    pacer.show(scene.draw)
     await_key()
+
+
+def run_headless(  # noqa: PLR0913
+    stats: Stats | None = None,
+    size: tuple[int, int] = GRID_SIZE,
+    *,
+    binary: bool = False,
+    seed: int = 0,
+    portfolio: int = 0,
+    parallel: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+    rule: int = RULE,
+    array: bool = False,
+) -> None:
+    solved, scene = solve_scene(
+        partial(create_scene, size, model=model, rule=rule, array=array),
+        stats,
+        seed=seed,
+        portfolio=portfolio,
+        parallel=parallel,
+        config=config,
+    )
+    sys.stderr.write(f"{'SOLVED' if solved else 'UNSOLVED'}\n")
+    write_scene(scene, binary=binary)
+
+
+def run_solutions(  # noqa: PLR0913
+    stats: Stats | None = None,
+    size: tuple[int, int] = GRID_SIZE,
+    *,
+    limit: int | None = None,
+    count: bool = False,
+    binary: bool = False,
+    seed: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+    rule: int = RULE,
+    array: bool = False,
+    parallel: int = 0,
+) -> None:
+    write_solutions(
+        partial(create_scene, size, model=model, rule=rule, array=array),
+        stats,
+        limit=limit,
+        count=count,
+        binary=binary,
+        seed=seed,
+        config=config,
+        parallel=parallel,
+    )
+
+
+SweepTask = tuple[int, tuple[int, int], int, "Config | None", bool]
+SweepResult = tuple[int, "bool | None", Stats, float]
+
+
+def sweep_rule(task: SweepTask) -> SweepResult:
+    rule, size, seed, config, model = task
+    random.seed(seed)
+    scene = create_scene(size, model=model, rule=rule)
+    scene.start_trail()
+    stats = Stats()
+    search = Search(scene, stats=stats, config=config)
+    start = time.perf_counter()
+    while search.step():
+        if stats.nodes >= SWEEP_NODES:
+            return rule, None, stats, time.perf_counter() - start
+    return rule, search.result, stats, time.perf_counter() - start
+
+
+def run_sweep(  # noqa: PLR0913
+    stats: Stats | None = None,
+    size: tuple[int, int] = GRID_SIZE,
+    *,
+    workers: int = 0,
+    seed: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+) -> None:
+    tasks = [(rule, size, seed, config, model) for rule in range(RULE_COUNT)]
+    solved = 0
+    context = multiprocessing.get_context()
+    with context.Pool(workers or None) as pool:
+        for rule, result, collected, elapsed in pool.imap(sweep_rule, tasks):
+            status = "SOLVED" if result else "LIMIT" if result is None else "UNSOLVED"
+            solved += bool(result)
+            sys.stdout.write(
+                f"{rule:3d} {status:8} {collected.nodes:8d} nodes {elapsed:9.4f}s\n",
+            )
+            if stats is not None:
+                stats.merge(collected)
+    sys.stderr.write(f"solved: {solved}/{len(tasks)}\n")
+
+
+def run_window(  # noqa: PLR0913
+    stats: Stats | None = None,
+    width: int = GRID_SIZE[0],
+    rows: int = GRID_SIZE[1],
+    *,
+    window: int = WINDOW_ROWS,
+    seed: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+    rule: int = RULE,
+) -> None:
+    """Solve rows top to bottom in a sliding window, streaming them to stdout.
+
+    Each window solves up to window rows below the last frozen row. The top
+    half of the window is frozen and written, the rest is solved again as part
+    of the next window. Only the window is kept and copied, so memory and copy
+    cost do not grow with the number of rows.
+    """
+    random.seed(seed)
+    frozen: list[int] | None = None
+    written = 0
+    while written < rows:
+        depth = min(window, rows - written)
+        scene = create_window(width, depth, frozen, model=model, rule=rule)
+        scene.start_trail()
+        if not solve_space(scene, stats=stats, config=config):
+            sys.stderr.write(f"UNSOLVED at row {written}\n")
+            return
+        top = frozen is not None
+        count = depth if written + depth == rows else max(1, depth - window // 2)
+        for y in range(top, top + count):
+            row = [scene.get((x, y)).state for x in range(width)]
+            sys.stdout.write("".join(map(str, row)) + "\n")
+            frozen = row
+        sys.stdout.flush()
+        written += count
+    sys.stderr.write("SOLVED\n")
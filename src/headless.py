@@ -0,0 +1,107 @@
+"""Solve planar scenes without a window, writing them to stdout.
+
+Loops and automata pass a factory of their scene, so every way of searching is
+written once: serially, as a portfolio of seeds, or in parallel.
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+from typing import TYPE_CHECKING, Callable, TypeVar, cast
+
+from src.parallel import solve_parallel
+from src.portfolio import solve_portfolio
+from src.solver import Config, count_solutions, iter_solutions, solve_space
+from src.space import PlanarSpace
+
+if TYPE_CHECKING:
+    from src.stats import Stats
+
+S = TypeVar("S", bound=PlanarSpace)
+
+
+def solve_scene(  # noqa: PLR0913
+    create_scene: Callable[[], S],
+    stats: Stats | None = None,
+    *,
+    seed: int = 0,
+    portfolio: int = 0,
+    parallel: int = 0,
+    config: Config | None = None,
+) -> tuple[bool, S]:
+    """Solve a new scene, with portfolio seeds or parallel workers if given.
+
+    The factory is pickled to portfolio workers, so it must be a module level
+    function or a partial of one. Returns whether the scene was solved, and the
+    solved scene, or a new scene if no solution was found.
+    """
+    if portfolio:
+        winner, solution = solve_portfolio(
+            create_scene,
+            range(seed, seed + portfolio),
+            stats,
+            config,
+        )
+        sys.stderr.write(f"seed: {winner}\n")
+    else:
+        random.seed(seed)
+        scene = create_scene()
+        if not parallel:
+            scene.start_trail()
+            return solve_space(scene, stats=stats, config=config), scene
+        solution, _ = solve_parallel(
+            scene,
+            parallel,
+            stats=stats,
+            config=config,
+            seed=seed,
+        )
+    if solution is None:
+        return False, create_scene()
+    return True, cast(S, solution)
+
+
+def write_scene(scene: PlanarSpace, *, binary: bool = False) -> None:
+    """Write the scene to stdout, as text or as binary dump."""
+    if binary:
+        sys.stdout.buffer.write(scene.dump())
+    else:
+        sys.stdout.write(f"{scene}\n")
+
+
+def write_solutions(  # noqa: PLR0913
+    create_scene: Callable[[], S],
+    stats: Stats | None = None,
+    *,
+    limit: int | None = None,
+    count: bool = False,
+    binary: bool = False,
+    seed: int = 0,
+    config: Config | None = None,
+    parallel: int = 0,
+) -> None:
+    """Write up to limit solutions of a new scene, or only their count.
+
+    With parallel workers, solutions are counted without a limit.
+    """
+    random.seed(seed)
+    scene = create_scene()
+    scene.start_trail()
+    if count and parallel:
+        _, found = solve_parallel(
+            scene,
+            parallel,
+            counting=True,
+            stats=stats,
+            config=config,
+            seed=seed,
+        )
+        sys.stdout.write(f"{found}\n")
+    elif count:
+        sys.stdout.write(f"{count_solutions(scene, limit, stats, config)}\n")
+    else:
+        for solution in iter_solutions(scene, limit, stats, config):
+            write_scene(solution, binary=binary)
+            if not binary:
+                sys.stdout.write("\n")
@@ -0,0 +1,213 @@
+"""Variable and value ordering heuristics of the search.
+
+A variable order chooses the unsolved position to branch on, a value order
+chooses in which order its states are tried. Both are selected by name in
+`src.solver.Config`.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.position import PositionState
+    from src.solver import Search
+    from src.space import Space, SpaceIndex
+
+RECENT_SCAN = 256
+
+
+class VariableOrder:
+    """Minimum remaining values: a position with fewest states, random on ties.
+
+    The edge keeps positions bucketed by number of states, so this does not scan
+    the edge.
+    """
+
+    def select(self: VariableOrder, space: Space) -> SpaceIndex | None:
+        """Return an unsolved position in the edge, or None if there is none."""
+        return space.edge.select()
+
+    def conflict(self: VariableOrder, space: Space) -> None:
+        """Take note of a failed propagation of the space."""
+
+
+class ScoredOrder(VariableOrder):
+    """Select a position with the lowest score, random on ties."""
+
+    def score(self: ScoredOrder, space: Space, index: SpaceIndex) -> float:
+        """Return the score of an unsolved position, lower is selected first."""
+        return space.get(index).count
+
+    def select(self: ScoredOrder, space: Space) -> SpaceIndex | None:
+        """Return an unsolved position in the edge with the lowest score."""
+        best: list[SpaceIndex] = []
+        best_score = math.inf
+        for index in space.edge:
+            if space.get(index).count < 2:  # noqa: PLR2004
+                continue
+            score = self.score(space, index)
+            if score < best_score:
+                best, best_score = [index], score
+            elif score == best_score:
+                best.append(index)
+        return random.choice(best) if best else None
+
+
+class DomainDegree(ScoredOrder):
+    """Number of states divided by the number of unsolved neighbors."""
+
+    def score(self: DomainDegree, space: Space, index: SpaceIndex) -> float:
+        """Return states per unsolved neighbor."""
+        degree = sum(
+            1
+            for neighbor in space.neighbors(index)
+            if not space.get(neighbor).is_solved
+        )
+        return space.get(index).count / (degree or 1)
+
+
+class DomainWeightedDegree(ScoredOrder):
+    """Number of states divided by a weight that grows with every conflict.
+
+    When propagating from a position fails, the weights of that position and
+    its neighbors are increased, so positions in hard regions go first.
+    Conflicts without a failing position, from inference or the transposition
+    table, add no weight.
+    """
+
+    weights: dict[SpaceIndex, int]
+
+    def __init__(self: DomainWeightedDegree) -> None:
+        """Create an order with all weights at 1."""
+        self.weights = {}
+
+    def score(self: DomainWeightedDegree, space: Space, index: SpaceIndex) -> float:
+        """Return states per weight."""
+        return space.get(index).count / self.weights.get(index, 1)
+
+    def conflict(self: DomainWeightedDegree, space: Space) -> None:
+        """Increase the weights around the position whose propagation failed."""
+        if space.failed is None:
+            return
+        for index in (space.failed, *space.neighbors(space.failed)):
+            self.weights[index] = self.weights.get(index, 1) + 1
+
+
+class MostRecent(VariableOrder):
+    """The unsolved position changed most recently, found at the end of the trail.
+
+    Without a trail, or if no recent change is unsolved, falls back to minimum
+    remaining values.
+    """
+
+    def select(self: MostRecent, space: Space) -> SpaceIndex | None:
+        """Return the most recently changed unsolved position in the edge."""
+        if space.trail is not None:
+            for entry in space.trail[: -RECENT_SCAN - 1 : -1]:
+                index = entry[0]
+                if index in space.edge and space.get(index).count > 1:
+                    return index
+        return space.edge.select()
+
+
+class ValueOrder:
+    """Try states in random order."""
+
+    def order(
+        self: ValueOrder,
+        search: Search,  # noqa: ARG002
+        index: SpaceIndex,  # noqa: ARG002
+        states: list[PositionState],
+    ) -> list[PositionState]:
+        """Return the states of the position at index in the order to try them."""
+        random.shuffle(states)
+        return states
+
+    def decided(self: ValueOrder, index: SpaceIndex, state: PositionState) -> None:
+        """Take note of a state being tried at the position at index."""
+
+
+class LeastConstraining(ValueOrder):
+    """Try first the state that removes the fewest states elsewhere.
+
+    Every state is tried and propagated, counting the changed positions, and
+    rolled back. States that fail are tried last. Probes leave the stats and the
+    conflict of the space as they were. Needs a trail, otherwise the order is
+    random.
+    """
+
+    def order(
+        self: LeastConstraining,
+        search: Search,
+        index: SpaceIndex,
+        states: list[PositionState],
+    ) -> list[PositionState]:
+        """Return the states ordered by the number of positions they change."""
+        random.shuffle(states)
+        space = search.current
+        if space.trail is None:
+            return states
+        from src.solver import propagate_queue
+
+        impact: dict[PositionState, float] = {}
+        saved = space.stats, space.cause, space.conflict, space.failed
+        space.stats = None
+        try:
+            for state in states:
+                checkpoint = space.checkpoint()
+                consistent = space.solve(index, state) and propagate_queue(space)
+                impact[state] = (
+                    len(space.trail) - checkpoint if consistent else math.inf
+                )
+                space.rollback(checkpoint)
+        finally:
+            space.stats, space.cause, space.conflict, space.failed = saved
+        return sorted(states, key=impact.__getitem__)
+
+
+class PhaseCache(ValueOrder):
+    """Try first the state last tried at the same position, then random.
+
+    After a restart or backjump, this returns the search to the assignments it
+    had made before, which were consistent up to the conflict.
+    """
+
+    phases: dict[SpaceIndex, PositionState]
+
+    def __init__(self: PhaseCache) -> None:
+        """Create an empty phase cache."""
+        self.phases = {}
+
+    def order(
+        self: PhaseCache,
+        search: Search,
+        index: SpaceIndex,
+        states: list[PositionState],
+    ) -> list[PositionState]:
+        """Return the states in random order, with the cached phase first."""
+        states = super().order(search, index, states)
+        phase = self.phases.get(index)
+        if phase in states:
+            states.remove(phase)
+            states.insert(0, phase)
+        return states
+
+    def decided(self: PhaseCache, index: SpaceIndex, state: PositionState) -> None:
+        """Cache the state as the phase of the position at index."""
+        self.phases[index] = state
+
+
+VARIABLE_ORDERS: dict[str, type[VariableOrder]] = {
+    "mrv": VariableOrder,
+    "dom-deg": DomainDegree,
+    "dom-wdeg": DomainWeightedDegree,
+    "recent": MostRecent,
+}
+VALUE_ORDERS: dict[str, type[ValueOrder]] = {
+    "random": ValueOrder,
+    "lcv": LeastConstraining,
+    "phase": PhaseCache,
+}
@@ -3,17 +3,28 @@
 from __future__ import annotations
 
 import math
+import os
 import random
-from typing import cast
+import struct
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+from itertools import product
+from typing import TYPE_CHECKING, BinaryIO, Iterator, cast
 
-from src.pygame import pygame
-from src.solver import solve_space
-from src.space import PlanarSpace, SpaceIndex
-from src.utils import await_key, flush_surface, setup_surface
+from src.headless import solve_scene, write_scene, write_solutions
+from src.model import Model, ModelSpace
+from src.solver import Config, solve_space
+from src.space import GridSpace, PlanarSpace, SpaceIndex
+from src.stats import Stats
+
+if TYPE_CHECKING:
+    from src.pygame import pygame
 
 GRID_SIZE = 25
 STATE_COUNT = 4
-FRAME_DELAY = 0.1
+FRAME_RATE = 10
 DRAW_SIZE = (1000, 1000)
 DRAW_SCALE = 2
 FILL_COLOR = (255, 255, 255)
@@ -21,17 +32,51 @@ STATE_COLOR = (128, 128, 128)
 LINE_COLOR = (0, 0, 0)
 EDGE_COLOR = (255, 128, 0)
 LINE_WIDTH = 4
+TILED_MAGIC = b"LOOP"
+TILED_HEADER = struct.Struct("<4sIII")
+TILE_HEADER = struct.Struct("<II")
+STATE_BITS = 2
+CELLS_PER_BYTE = 8 // STATE_BITS
 ANGLE_LOOKUP = [
     (0.5, -0.5, math.pi),
     (0.5, 0.5, math.pi / 2),
     (-0.5, 0.5, 0),
     (-0.5, -0.5, math.pi / 2 * 3),
 ]
+HORIZONTAL_PAIRS = [
+    (left, right)
+    for left, right in product(range(STATE_COUNT), repeat=2)
+    if (left in (0, 1)) != (right in (0, 1))
+]
+VERTICAL_PAIRS = [
+    (up, down)
+    for up, down in product(range(STATE_COUNT), repeat=2)
+    if (up in (0, 3)) != (down in (0, 3))
+]
+HORIZONTAL_MASKS = [0b0011, 0b0011, 0b1100, 0b1100]
+VERTICAL_MASKS = [0b1001, 0b0110, 0b0110, 0b1001]
+
+
+Border = list[int]
+TileTask = tuple[
+    int,
+    int,
+    tuple[int, int],
+    Border | None,
+    Border | None,
+    str,
+    Config | None,
+    bool,
+    bool,
+    bool,
+]
+TileResult = tuple[int, int, bool, list[list[int]], Stats | None]
 
 
 class Scene(PlanarSpace):
     def propagate(self: Scene, index: SpaceIndex) -> bool:
         x, y = cast(tuple[int, int], index)
+        width, height = self.size
         state = self.get((x, y)).state
         return (
             (
@@ -42,7 +87,7 @@ class Scene(PlanarSpace):
                 )
             )
             and (
-                x == GRID_SIZE - 1
+                x == width - 1
                 or (
                     (state not in (0, 1) or (self.remove((x + 1, y), [0, 1])))
                     and (state not in (2, 3) or (self.remove((x + 1, y), [2, 3])))
@@ -56,7 +101,7 @@ class Scene(PlanarSpace):
                 )
             )
             and (
-                y == GRID_SIZE - 1
+                y == height - 1
                 or (
                     (state not in (0, 3) or (self.remove((x, y + 1), [0, 3])))
                     and (state not in (1, 2) or (self.remove((x, y + 1), [1, 2])))
@@ -66,19 +111,21 @@ class Scene(PlanarSpace):
 
     @property
     def is_valid(self: Scene) -> bool:
-        for y in range(GRID_SIZE):
-            for x in range(GRID_SIZE):
-                if not self.get((x, y)).is_solved:
+        width, height = self.size
+        matrix = self.matrix
+        for y in range(height):
+            for x in range(width):
+                if not matrix[y][x].is_solved:
                     return False
-                state = self.get((x, y)).state
-                if x < GRID_SIZE - 1:
-                    right = self.get((x + 1, y)).state
+                state = matrix[y][x].state
+                if x < width - 1:
+                    right = matrix[y][x + 1].state
                     if (state in (0, 1) and right in (0, 1)) or (
                         state in (2, 3) and right in (2, 3)
                     ):
                         return False
-                if y < GRID_SIZE - 1:
-                    down = self.get((x, y + 1)).state
+                if y < height - 1:
+                    down = matrix[y + 1][x].state
                     if (state in (0, 3) and down in (0, 3)) or (
                         state in (1, 2) and down in (1, 2)
                     ):
@@ -89,20 +136,23 @@ class Scene(PlanarSpace):
         self: Scene,
         surface: pygame.Surface,
     ) -> None:
+        from src.pygame import pygame
+
         pygame.draw.rect(
             surface,
             FILL_COLOR,
             (0, 0, DRAW_SIZE[0], DRAW_SIZE[1]),
         )
-        step = ((DRAW_SIZE[0] - 1) / GRID_SIZE, (DRAW_SIZE[1] - 1) / GRID_SIZE)
-        for y in range(GRID_SIZE):
-            for x in range(GRID_SIZE):
-                postion = self.get((x, y))
+        width, height = self.size
+        step = ((DRAW_SIZE[0] - 1) / width, (DRAW_SIZE[1] - 1) / height)
+        for y in range(height):
+            for x in range(width):
+                postion = self.matrix[y][x]
                 color = (
                     LINE_COLOR
                     if postion.is_solved
                     else EDGE_COLOR
-                    if (x, y) in self.edge
+                    if self.index(x, y) in self.edge
                     else STATE_COLOR
                 )
                 for state in postion.states:
@@ -128,24 +178,283 @@ class Scene(PlanarSpace):
         )
 
 
-def draw_wait(scene: Scene, window: pygame.Surface, surface: pygame.Surface) -> None:
-    scene.draw(surface)
-    flush_surface(window, surface)
-    await_key(seconds=FRAME_DELAY)
+class ModelScene(ModelSpace, Scene):
+    pass
+
+
+class FlatScene(GridSpace, Scene):
+    def propagate(self: FlatScene, index: SpaceIndex) -> bool:
+        cell = cast(int, index)
+        left, right, up, down = self.sides[cell]
+        state = self.cells[cell].state
+        across = HORIZONTAL_MASKS[state]
+        along = VERTICAL_MASKS[state]
+        return (
+            (left < 0 or self.remove_mask(left, across))
+            and (right < 0 or self.remove_mask(right, across))
+            and (up < 0 or self.remove_mask(up, along))
+            and (down < 0 or self.remove_mask(down, along))
+        )
+
 
+def create_model(size: tuple[int, int]) -> Model:
+    width, height = size
+    model = Model(STATE_COUNT)
+    for y in range(height):
+        for x in range(width):
+            if x < width - 1:
+                model.pairwise((x, y), (x + 1, y), HORIZONTAL_PAIRS)
+            if y < height - 1:
+                model.pairwise((x, y), (x, y + 1), VERTICAL_PAIRS)
+    return model
 
-def run() -> None:
-    random.seed(0)
+
+def create_scene(
+    size: int = GRID_SIZE,
+    *,
+    model: bool = False,
+    flat: bool = False,
+    array: bool = False,
+) -> Scene:
+    return create_rect_scene((size, size), model=model, flat=flat, array=array)
+
+
+def create_rect_scene(
+    size: tuple[int, int],
+    *,
+    model: bool = False,
+    flat: bool = False,
+    array: bool = False,
+) -> Scene:
+    if model:
+        scene = ModelScene(count=STATE_COUNT, size=size)
+        scene.use_model(create_model(size))
+        return scene
+    if array:
+        from src.array_space import LoopsScene
+
+        return LoopsScene(count=STATE_COUNT, size=size)
+    if flat:
+        return FlatScene(count=STATE_COUNT, size=size)
+    return Scene(count=STATE_COUNT, size=size)
+
+
+def run(  # noqa: PLR0913
+    stats: Stats | None = None,
+    seed: int = 0,
+    config: Config | None = None,
+    *,
+    model: bool = False,
+    flat: bool = False,
+    array: bool = False,
+    fps: float = FRAME_RATE,
+) -> None:
+    from src.pygame import pygame
+    from src.utils import FramePacer, await_key, setup_surface
+
+    random.seed(seed)
     window, surface = setup_surface("Solve Loop", DRAW_SIZE, DRAW_SCALE)
-    scene = Scene(count=STATE_COUNT, size=(GRID_SIZE, GRID_SIZE))
+    scene = create_scene(model=model, flat=flat, array=array)
+    scene.start_trail()
+    pacer = FramePacer(window, surface, fps)
     solved = solve_space(
         scene,
-        lambda s: draw_wait(cast(Scene, s), window, surface),
+        lambda s: pacer.sample(cast(Scene, s).draw),
+        stats,
+        config,
     )
     valid = scene.is_valid
     pygame.display.set_caption(
         ("SOLVED" if valid and solved else "UNSOLVED" if valid else "INVALID")
         + " (ESC to exit)",
     )
-    draw_wait(scene, window, surface)
+    pacer.show(scene.draw)
     await_key()
+
+
+def run_headless(  # noqa: PLR0913
+    stats: Stats | None = None,
+    size: int = GRID_SIZE,
+    *,
+    binary: bool = False,
+    seed: int = 0,
+    portfolio: int = 0,
+    parallel: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+    flat: bool = False,
+    array: bool = False,
+) -> None:
+    solved, scene = solve_scene(
+        partial(create_scene, size, model=model, flat=flat, array=array),
+        stats,
+        seed=seed,
+        portfolio=portfolio,
+        parallel=parallel,
+        config=config,
+    )
+    valid = scene.is_valid
+    sys.stderr.write(
+        f"{'SOLVED' if valid and solved else 'UNSOLVED' if valid else 'INVALID'}\n",
+    )
+    write_scene(scene, binary=binary)
+
+
+def run_solutions(  # noqa: PLR0913
+    stats: Stats | None = None,
+    size: int = GRID_SIZE,
+    *,
+    limit: int | None = None,
+    count: bool = False,
+    binary: bool = False,
+    seed: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+    flat: bool = False,
+    array: bool = False,
+    parallel: int = 0,
+) -> None:
+    write_solutions(
+        partial(create_scene, size, model=model, flat=flat, array=array),
+        stats,
+        limit=limit,
+        count=count,
+        binary=binary,
+        seed=seed,
+        config=config,
+        parallel=parallel,
+    )
+
+
+def pack_cells(cells: list[int]) -> bytes:
+    data = bytearray(-(-len(cells) // CELLS_PER_BYTE))
+    for i, state in enumerate(cells):
+        data[i // CELLS_PER_BYTE] |= state << (i % CELLS_PER_BYTE * STATE_BITS)
+    return bytes(data)
+
+
+def unpack_cells(data: bytes, count: int) -> list[int]:
+    mask = (1 << STATE_BITS) - 1
+    return [
+        data[i // CELLS_PER_BYTE] >> (i % CELLS_PER_BYTE * STATE_BITS) & mask
+        for i in range(count)
+    ]
+
+
+def tile_size(i: int, j: int, size: tuple[int, int], tile: int) -> tuple[int, int]:
+    return min(tile, size[0] - i * tile), min(tile, size[1] - j * tile)
+
+
+def read_tiles(stream: BinaryIO) -> Iterator[tuple[int, int, list[list[int]]]]:
+    """Yield tile column, tile row and cell states of a tiled plane.
+
+    Tiles are read in the order they were written, which is not raster order.
+    """
+    magic, width, height, tile = TILED_HEADER.unpack(stream.read(TILED_HEADER.size))
+    if magic != TILED_MAGIC:
+        raise ValueError
+    while record := stream.read(TILE_HEADER.size):
+        i, j = TILE_HEADER.unpack(record)
+        w, h = tile_size(i, j, (width, height), tile)
+        cells = unpack_cells(stream.read(-(-w * h // CELLS_PER_BYTE)), w * h)
+        yield i, j, [cells[y * w : (y + 1) * w] for y in range(h)]
+
+
+def solve_tile(task: TileTask) -> TileResult:
+    """Solve a tile, with the fixed border cells of its left and top tiles.
+
+    The borders are solved into an extra column and row of the tile scene, so
+    propagation carries them into the tile and `is_valid` checks the seams.
+    """
+    i, j, size, left, top, seed, config, model, flat, collect = task
+    random.seed(seed)
+    dx, dy = int(left is not None), int(top is not None)
+    scene = create_rect_scene((size[0] + dx, size[1] + dy), model=model, flat=flat)
+    for y, state in enumerate(left or ()):
+        scene.solve(scene.index(0, y + dy), state)
+    for x, state in enumerate(top or ()):
+        scene.solve(scene.index(x + dx, 0), state)
+    scene.start_trail()
+    stats = Stats() if collect else None
+    solved = solve_space(scene, stats=stats, config=config) and scene.is_valid
+    cells = [
+        [scene.matrix[y + dy][x + dx].state for x in range(size[0])]
+        for y in range(size[1])
+    ]
+    return i, j, solved, cells, stats
+
+
+def solve_now(task: TileTask) -> Future[TileResult]:
+    future: Future[TileResult] = Future()
+    future.set_result(solve_tile(task))
+    return future
+
+
+def run_tiled(  # noqa: PLR0913
+    stats: Stats | None = None,
+    size: int = GRID_SIZE,
+    tile: int = GRID_SIZE,
+    *,
+    workers: int = 0,
+    seed: int = 0,
+    config: Config | None = None,
+    model: bool = False,
+    flat: bool = False,
+) -> None:
+    """Solve the plane tile by tile, streaming tiles to stdout as they finish.
+
+    A tile depends on the tiles to its left and top, so tiles on a diagonal are
+    solved in parallel. Of finished tiles only the border cells are kept, until
+    the tile depending on them is scheduled.
+    """
+    workers = workers or os.cpu_count() or 1
+    plane = (size, size)
+    tiles = -(-size // tile)
+    stream = sys.stdout.buffer
+    stream.write(TILED_HEADER.pack(TILED_MAGIC, size, size, tile))
+    rights: dict[tuple[int, int], Border] = {}
+    bottoms: dict[tuple[int, int], Border] = {}
+    ready = deque([(0, 0)])
+    pending: set[Future[TileResult]] = set()
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    valid = True
+    try:
+        while ready or pending:
+            while ready and len(pending) < workers:
+                i, j = ready.popleft()
+                task: TileTask = (
+                    i,
+                    j,
+                    tile_size(i, j, plane, tile),
+                    rights.pop((i - 1, j), None),
+                    bottoms.pop((i, j - 1), None),
+                    f"{seed}:{i}:{j}",
+                    config,
+                    model,
+                    flat,
+                    stats is not None,
+                )
+                pending.add(
+                    pool.submit(solve_tile, task) if pool else solve_now(task),
+                )
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, j, solved, cells, collected = future.result()
+                valid = valid and solved
+                stream.write(TILE_HEADER.pack(i, j))
+                stream.write(pack_cells([state for row in cells for state in row]))
+                if stats is not None and collected is not None:
+                    stats.merge(collected)
+                if i + 1 < tiles:
+                    rights[i, j] = [row[-1] for row in cells]
+                    if not j or (i + 1, j - 1) in bottoms:
+                        ready.append((i + 1, j))
+                if j + 1 < tiles:
+                    bottoms[i, j] = cells[-1]
+                    if not i or (i - 1, j + 1) in rights:
+                        ready.append((i, j + 1))
+    finally:
+        if pool:
+            pool.shutdown()
+    stream.flush()
+    sys.stderr.write(f"{'SOLVED' if valid else 'UNSOLVED'}\n")
@@ -0,0 +1,342 @@
+"""Declarative constraint models, compiled for a generic propagator.
+
+A model states the structure of a space once, as constraints over positions:
+all-different groups, pairwise compatibility tables and n-ary tables of allowed
+state combinations. Compiling turns groups into a flat tuple of peers per
+position, and tables into support bitmasks: for every combination of state
+masks of the positions in a table, the states of each position that appear in
+an allowed row. Tables of two positions become arcs, holding the supported
+states of one position for every mask of the other. Revising a table or an arc
+is then a single lookup.
+
+Propagation is arc consistency in the style of AC-3, driven by the queue of the
+space: every position that changes is queued, and all its arcs and tables are
+revised. Because supports are looked up rather than searched for, no residual
+supports need to be kept as in AC-2001.
+"""
+
+from __future__ import annotations
+
+from functools import cache, reduce
+from operator import or_
+from typing import TYPE_CHECKING, Iterable, cast
+
+from src.space import PlanarSpace
+
+if TYPE_CHECKING:
+    from src.position import BitPosition, Position
+    from src.space import SpaceIndex
+
+Index = tuple[int, int]
+
+LOOKUP_BITS = 12
+
+Row = tuple[int, ...]
+Rows = tuple[Row, ...]
+
+
+class Constraint:
+    """A compiled table constraint over some positions.
+
+    Rows hold the allowed combinations as one bit per position. If the masks of
+    all positions fit in `LOOKUP_BITS` bits, supports holds the supported masks
+    for every combination of position masks, otherwise rows are scanned.
+    """
+
+    indices: tuple[Index, ...]
+    rows: Rows
+    supports: Rows | None
+    count: int
+
+    def __init__(
+        self: Constraint,
+        indices: tuple[Index, ...],
+        rows: Rows,
+        supports: Rows | None,
+        count: int,
+    ) -> None:
+        """Create a constraint from compiled rows and supports."""
+        self.indices = indices
+        self.rows = rows
+        self.supports = supports
+        self.count = count
+
+    def scan(self: Constraint, positions: list[BitPosition]) -> Row:
+        """Return for every position the mask of its states in an allowed row."""
+        supported = [0] * len(positions)
+        for row in self.rows:
+            if all(position.mask & bit for position, bit in zip(positions, row)):
+                for i, bit in enumerate(row):
+                    supported[i] |= bit
+        return tuple(supported)
+
+    def revise(self: Constraint, space: ModelSpace) -> bool:
+        """Remove all unsupported states, returning False on a conflict."""
+        matrix = space.matrix
+        positions = [matrix[y][x] for x, y in self.indices]
+        supports = self.supports
+        if supports is None:
+            supported = self.scan(positions)
+        else:
+            key = 0
+            for position in positions:
+                key = key << self.count | position.mask
+            supported = supports[key]
+        for index, position, mask in zip(self.indices, positions, supported):
+            hit = position.mask & ~mask
+            if hit and not space.remove_mask(index, hit):
+                return False
+        return True
+
+
+@cache
+def table_supports(rows: Rows, count: int) -> tuple[Rows, Rows | None]:
+    """Return rows as bits, and the supported masks for every combination of masks.
+
+    Supports are None if the masks of all positions exceed `LOOKUP_BITS` bits.
+    Results are cached, so tables with equal rows share them.
+    """
+    bits = tuple(tuple(1 << state for state in row) for row in rows)
+    arity = len(rows[0])
+    if arity * count > LOOKUP_BITS:
+        return bits, None
+    full = (1 << count) - 1
+    supports = []
+    for key in range(1 << (arity * count)):
+        masks = [key >> (count * (arity - 1 - i)) & full for i in range(arity)]
+        supported = [0] * arity
+        for row in bits:
+            if all(mask & bit for mask, bit in zip(masks, row)):
+                for i, bit in enumerate(row):
+                    supported[i] |= bit
+        supports.append(tuple(supported))
+    return bits, tuple(supports)
+
+
+@cache
+def arc_supports(rows: Rows, side: int, count: int) -> Row:
+    """Return the supported states of the other side for every mask of side.
+
+    Results are cached, so arcs with equal rows share them.
+    """
+    return tuple(
+        reduce(
+            or_,
+            (1 << row[1 - side] for row in rows if mask >> row[side] & 1),
+            0,
+        )
+        for mask in range(1 << count)
+    )
+
+
+class Model:
+    """Constraints over the positions of a space with count states each.
+
+    Constraints are added with `all_different`, `pairwise` and `table`, then
+    `compile` builds the peers, arcs, constraints and scope of every position.
+    Positions outside the space can be given to `table`, they are projected out.
+    """
+
+    count: int
+    groups: list[tuple[Index, ...]]
+    tables: list[tuple[tuple[Index, ...], Rows]]
+    peers: dict[Index, tuple[Index, ...]]
+    arcs: dict[Index, tuple[tuple[Index, Row], ...]]
+    constraints: dict[Index, tuple[Constraint, ...]]
+    scopes: dict[Index, tuple[Index, ...]]
+
+    def __init__(self: Model, count: int) -> None:
+        """Create an empty model of positions with count states."""
+        self.count = count
+        self.groups = []
+        self.tables = []
+        self.peers = {}
+        self.arcs = {}
+        self.constraints = {}
+        self.scopes = {}
+
+    def all_different(self: Model, indices: Iterable[Index]) -> None:
+        """Require the solved states of all positions to differ."""
+        self.groups.append(tuple(indices))
+
+    def pairwise(
+        self: Model,
+        first: Index,
+        second: Index,
+        pairs: Iterable[tuple[int, int]],
+    ) -> None:
+        """Allow only the given state pairs of two positions."""
+        self.table((first, second), pairs)
+
+    def table(self: Model, indices: Iterable[Index], rows: Iterable[Row]) -> None:
+        """Allow only the given state combinations of the positions."""
+        self.tables.append((tuple(indices), tuple(rows)))
+
+    def compile(self: Model, inside: Iterable[Index]) -> None:
+        """Compile all constraints, keeping only positions inside the space.
+
+        Tables with fewer than two positions inside constrain nothing and are
+        dropped. Tables of two positions become a pair of arcs, each holding
+        the supported states of the other position for every mask of its own.
+        """
+        inside = set(inside)
+        self.peers = compile_peers(self.groups)
+        arcs: dict[Index, list[tuple[Index, Row]]] = {}
+        constraints: dict[Index, list[Constraint]] = {}
+        scopes: dict[Index, dict[Index, None]] = {}
+        for indices, rows in self.tables:
+            keep = [i for i, index in enumerate(indices) if index in inside]
+            if len(keep) < 2:  # noqa: PLR2004
+                continue
+            cells = tuple(indices[i] for i in keep)
+            projected = tuple(sorted({tuple(row[i] for i in keep) for row in rows}))
+            if len(cells) == 2 and self.count <= LOOKUP_BITS:  # noqa: PLR2004
+                for side in (0, 1):
+                    arcs.setdefault(cells[side], []).append(
+                        (cells[1 - side], arc_supports(projected, side, self.count)),
+                    )
+            else:
+                constraint = Constraint(
+                    cells,
+                    *table_supports(projected, self.count),
+                    self.count,
+                )
+                for index in cells:
+                    constraints.setdefault(index, []).append(constraint)
+            for index in cells:
+                scopes.setdefault(index, {}).update(
+                    (other, None) for other in cells if other != index
+                )
+        self.arcs = {index: tuple(found) for index, found in arcs.items()}
+        self.constraints = {index: tuple(found) for index, found in constraints.items()}
+        self.scopes = {index: tuple(others) for index, others in scopes.items()}
+
+
+def compile_peers(groups: list[tuple[Index, ...]]) -> dict[Index, tuple[Index, ...]]:
+    """Return for every position the other positions in any of its groups."""
+    peers: dict[Index, dict[Index, None]] = {}
+    for group in groups:
+        for index in group:
+            peers.setdefault(index, {}).update(dict.fromkeys(group))
+    return {
+        index: tuple(other for other in others if other != index)
+        for index, others in peers.items()
+    }
+
+
+class ModelSpace(PlanarSpace):
+    """A 2D space whose structure is given by a compiled model.
+
+    Unlike spaces that only propagate solved positions, every position with
+    arcs or tables is queued when its states are reduced, so they are kept arc
+    consistent. Subclasses can mix in a handwritten space to reuse its loading
+    and drawing.
+    """
+
+    model: Model
+
+    def use_model(self: ModelSpace, model: Model) -> None:
+        """Compile the model for the positions of this space and use it."""
+        model.compile(index for index, _ in self.positions)
+        self.model = model
+
+    def copy(self: ModelSpace) -> ModelSpace:
+        """Return a deep copy of this space, sharing the model."""
+        copy = cast(ModelSpace, super().copy())
+        copy.model = self.model
+        return copy
+
+    def neighbors(self: ModelSpace, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        """Return the indices of positions that share a constraint with index."""
+        cell = cast(Index, index)
+        model = self.model
+        return dict.fromkeys((*model.peers.get(cell, ()), *model.scopes.get(cell, ())))
+
+    def scope(self: ModelSpace, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        """Return the index and the positions of all its arcs and tables."""
+        return (index, *self.model.scopes.get(cast(Index, index), ()))
+
+    def propagate(self: ModelSpace, index: SpaceIndex) -> bool:
+        """Remove a solved state from all peers, then revise all arcs and tables."""
+        cell = cast(Index, index)
+        model = self.model
+        matrix = self.matrix
+        mask = matrix[cell[1]][cell[0]].mask
+        if not mask & (mask - 1):
+            for peer in model.peers.get(cell, ()):
+                if matrix[peer[1]][peer[0]].mask & mask and not self.remove_mask(
+                    peer,
+                    mask,
+                ):
+                    return False
+        for other, supports in model.arcs.get(cell, ()):
+            hit = matrix[other[1]][other[0]].mask & ~supports[mask]
+            if hit and not self.remove_mask(other, hit):
+                return False
+        if not all(
+            constraint.revise(self) for constraint in model.constraints.get(cell, ())
+        ):
+            return False
+        self.extend(cell)
+        return True
+
+    def extend(self: ModelSpace, cell: Index) -> None:
+        """Add the unsolved positions in the scope of cell to the edge.
+
+        With few states, positions are often solved by their first reduction and
+        would never enter the edge. Additions are recorded, so they are undone on
+        rollback. If cell is solved, positions already in the edge are ranked
+        again.
+        """
+        edge = self.edge
+        matrix = self.matrix
+        solved = matrix[cell[1]][cell[0]].is_solved
+        for other in self.model.scopes.get(cell, ()):
+            if other in edge:
+                if solved:
+                    self.add_edge(other)
+                continue
+            position = matrix[other[1]][other[0]]
+            if not position.is_solved:
+                self.record(other, position)
+                self.add_edge(other)
+
+    def untouched(self: ModelSpace, cell: Index) -> int:
+        """Return the number of arcs and tables of cell without a solved position."""
+        model = self.model
+        matrix = self.matrix
+        count = 0
+        for other, _ in model.arcs.get(cell, ()):
+            mask = matrix[other[1]][other[0]].mask
+            if mask & (mask - 1):
+                count += 1
+        for constraint in model.constraints.get(cell, ()):
+            for x, y in constraint.indices:
+                mask = matrix[y][x].mask
+                if (x, y) != cell and not mask & (mask - 1):
+                    break
+            else:
+                count += 1
+        return count
+
+    def add_edge(self: ModelSpace, index: SpaceIndex) -> None:
+        """Add the position to the edge, ranked by states and untouched tables.
+
+        Among positions with equally many states, those whose arcs and tables
+        already hold solved positions are selected first, keeping the search
+        close to what is solved.
+        """
+        cell = cast(Index, index)
+        position = self.matrix[cell[1]][cell[0]]
+        count = position.count
+        self.edge.add(index, count + self.untouched(cell) if count > 1 else count)
+
+    def reduced(self: ModelSpace, index: SpaceIndex, position: Position) -> None:
+        """Update queue and edge, also queueing unsolved positions with a scope."""
+        if position.is_solved or index not in self.model.scopes:
+            super().reduced(index, position)
+            return
+        if self.stats is not None:
+            self.stats.removes += 1
+        self.add_edge(index)
+        self.queue.push(self, index)
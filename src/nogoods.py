@@ -0,0 +1,90 @@
+"""Learned nogoods, combinations of decisions known to lead to a conflict.
+
+When the search backjumps, the decisions responsible for the conflict are
+recorded as a nogood. During propagation, a nogood with all but one decision
+holding removes the state of the remaining decision, and a nogood with all
+decisions holding is a conflict. The store is bounded, evicting the oldest
+nogoods first.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.position import PositionState
+    from src.space import Space, SpaceIndex
+
+Literal = tuple["SpaceIndex", "PositionState"]
+
+
+class Nogoods:
+    """Bounded store of nogoods, indexed by the decisions they contain."""
+
+    limit: int
+    store: dict[int, tuple[Literal, ...]]
+    watches: dict[Literal, dict[int, None]]
+    added: int
+
+    def __init__(self: Nogoods, limit: int) -> None:
+        """Create an empty store holding up to limit nogoods."""
+        self.limit = limit
+        self.store = {}
+        self.watches = {}
+        self.added = 0
+
+    def add(self: Nogoods, literals: tuple[Literal, ...]) -> None:
+        """Add a nogood, evicting the oldest one if the store is full."""
+        if not literals:
+            return
+        if len(self.store) >= self.limit:
+            oldest = next(iter(self.store))
+            for literal in self.store.pop(oldest):
+                watch = self.watches[literal]
+                del watch[oldest]
+                if not watch:
+                    del self.watches[literal]
+        key = self.added
+        self.added += 1
+        self.store[key] = literals
+        for literal in literals:
+            self.watches.setdefault(literal, {})[key] = None
+
+    def check(self: Nogoods, space: Space, index: SpaceIndex) -> bool:
+        """Apply the nogoods containing the solved position at index.
+
+        Returns False on a conflict, with its reasons added to the conflict of
+        the space.
+        """
+        position = space.get(index)
+        if not position.is_solved:
+            return True
+        watched = self.watches.get((index, position.state))
+        if not watched:
+            return True
+        reasons = space.reasons or {}
+        for key in watched:
+            unit = None
+            levels = 0
+            for other, state in self.store[key]:
+                position = space.get(other)
+                if position.is_solved and position.state == state:
+                    levels |= reasons.get(other, 0)
+                    continue
+                if unit is not None or not position.has(state):
+                    break
+                unit = (other, state)
+            else:
+                if space.stats is not None:
+                    space.stats.nogood_prunes += 1
+                if unit is None:
+                    space.conflict |= levels
+                    return False
+                space.cause = levels
+                if not space.remove(unit[0], [unit[1]]):
+                    return False
+        return True
+
+    def __len__(self: Nogoods) -> int:
+        """Return the number of nogoods in the store."""
+        return len(self.store)
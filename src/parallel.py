@@ -0,0 +1,218 @@
+"""Parallel search, splitting the search tree of a single space across processes.
+
+Unlike a portfolio, workers never search the same part of the tree. A worker
+that runs out of work waits for a task on a shared queue. Busy workers check
+regularly whether another worker is waiting, and if so donate the shallowest
+untried branch of their search, which is likely the largest one. Tasks are
+shipped as pickled spaces, without trail or stats.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import pickle
+import queue
+import random
+from typing import TYPE_CHECKING
+
+from src.solver import Config, Search
+from src.stats import Stats
+
+if TYPE_CHECKING:
+    from multiprocessing.queues import Queue
+    from multiprocessing.sharedctypes import Synchronized
+    from multiprocessing.synchronize import Event
+
+    from src.space import Space
+
+CHECK_INTERVAL = 64
+POLL_TIMEOUT = 0.01
+JOIN_TIMEOUT = 1.0
+
+Message = tuple["bytes | None", int, "Stats | None"]
+
+
+class Shared:
+    """State shared between the workers of a parallel search.
+
+    Pending counts tasks that are queued or being searched, the search is over
+    once it drops to zero. Idle counts workers waiting for a task, queued counts
+    tasks on the queue.
+    """
+
+    tasks: Queue[bytes]
+    messages: Queue[Message]
+    stop: Event
+    pending: Synchronized[int]
+    idle: Synchronized[int]
+    queued: Synchronized[int]
+
+    def __init__(self: Shared) -> None:
+        """Create empty shared state."""
+        context = multiprocessing.get_context()
+        self.tasks = context.Queue()
+        self.messages = context.Queue()
+        self.stop = context.Event()
+        self.pending = context.Value("i", 0)
+        self.idle = context.Value("i", 0)
+        self.queued = context.Value("i", 0)
+
+    def put(self: Shared, space: Space) -> None:
+        """Add a space to the task queue."""
+        with self.pending.get_lock():
+            self.pending.value += 1
+        with self.queued.get_lock():
+            self.queued.value += 1
+        self.tasks.put(dump(space))
+
+    def get(self: Shared) -> Space | None:
+        """Wait for a space from the task queue, or None once stopped."""
+        with self.idle.get_lock():
+            self.idle.value += 1
+        try:
+            while not self.stop.is_set():
+                try:
+                    data = self.tasks.get(timeout=POLL_TIMEOUT)
+                except queue.Empty:
+                    continue
+                with self.queued.get_lock():
+                    self.queued.value -= 1
+                space: Space = pickle.loads(data)  # noqa: S301
+                return space
+            return None
+        finally:
+            with self.idle.get_lock():
+                self.idle.value -= 1
+
+    def done(self: Shared) -> None:
+        """Mark a task as finished, stopping all workers if it was the last."""
+        with self.pending.get_lock():
+            self.pending.value -= 1
+            if self.pending.value == 0:
+                self.stop.set()
+
+    def wanted(self: Shared) -> bool:
+        """Return True if a worker is waiting and no task is queued for it."""
+        return self.idle.value > 0 and self.queued.value == 0
+
+
+def dump(space: Space) -> bytes:
+    """Serialize a space without its trail and stats."""
+    trail, stats = space.trail, space.stats
+    space.trail, space.stats = None, None
+    try:
+        return pickle.dumps(space, pickle.HIGHEST_PROTOCOL)
+    finally:
+        space.trail, space.stats = trail, stats
+
+
+def search_task(
+    shared: Shared,
+    space: Space,
+    stats: Stats | None,
+    config: Config | None,
+    *,
+    counting: bool,
+) -> int:
+    """Search a task space, donating branches to waiting workers.
+
+    Returns the number of solutions found.
+    """
+    space.start_trail()
+    search = Search(space, stats=stats, config=config)
+    count = 0
+    steps = 0
+    while not shared.stop.is_set():
+        if not search.step():
+            if not search.result:
+                break
+            count += 1
+            if not counting:
+                shared.messages.put((dump(space), 0, None))
+                shared.stop.set()
+                break
+            search.resume()
+            continue
+        steps += 1
+        if steps % CHECK_INTERVAL == 0 and shared.wanted():
+            branch = search.split()
+            if branch is not None:
+                shared.put(branch)
+    return count
+
+
+def worker(
+    shared: Shared,
+    seed: int,
+    config: Config | None,
+    *,
+    counting: bool,
+    collect: bool,
+) -> None:
+    """Search tasks until stopped, then report the count and stats.
+
+    Solutions are sent as pickled spaces with a count of zero, the final report
+    has no space.
+    """
+    random.seed(seed)
+    stats = Stats() if collect else None
+    count = 0
+    while (space := shared.get()) is not None:
+        count += search_task(shared, space, stats, config, counting=counting)
+        shared.done()
+    shared.messages.put((None, count, stats))
+
+
+def solve_parallel(  # noqa: PLR0913
+    space: Space,
+    workers: int | None = None,
+    *,
+    counting: bool = False,
+    stats: Stats | None = None,
+    config: Config | None = None,
+    seed: int = 0,
+) -> tuple[Space | None, int]:
+    """Search the space with the given number of worker processes.
+
+    Without counting, the first solution stops all workers. With counting, all
+    branches are searched and the solutions counted. Restarts are not used, as
+    they would throw away donated branches. Stats of all workers are merged into
+    the given stats.
+
+    Returns a solved space, or None if there is none, and the solution count.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    if config is not None:
+        config = config.exhaustive()
+    shared = Shared()
+    shared.put(space)
+    context = multiprocessing.get_context()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(shared, seed + index, config),
+            kwargs={"counting": counting, "collect": stats is not None},
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    solution: Space | None = None
+    count = 0
+    reported = 0
+    while reported < workers:
+        data, found, collected = shared.messages.get()
+        if data is not None:
+            if solution is None:
+                solution = pickle.loads(data)  # noqa: S301
+            continue
+        count += found
+        reported += 1
+        if stats is not None and collected is not None:
+            stats.merge(collected)
+    for process in processes:
+        process.join(JOIN_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    return solution, count
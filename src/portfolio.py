@@ -0,0 +1,112 @@
+"""Portfolio solving, running the same space with different seeds in parallel.
+
+Randomized search times vary widely between seeds. Running several seeds at
+once and taking the first solution cuts off the slow tail. The winning seed is
+returned, so the run can be replayed deterministically.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import random
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from src.solver import Config, Search
+from src.stats import Stats
+
+if TYPE_CHECKING:
+    from multiprocessing.queues import Queue
+    from multiprocessing.synchronize import Event
+
+    from src.space import Space
+
+CHECK_INTERVAL = 64
+JOIN_TIMEOUT = 1.0
+
+Factory = Callable[[], "Space"]
+Outcome = tuple[int, "Space | None", "Stats | None"]
+
+
+def solve_seed(
+    factory: Factory,
+    seed: int,
+    stop: Event | None = None,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> Space | None:
+    """Solve a new space with the given seed, until solved or stopped.
+
+    Returns the solved space, or None if unsolvable or stopped.
+    """
+    random.seed(seed)
+    space = factory()
+    space.start_trail()
+    search = Search(space, stats=stats, config=config)
+    steps = 0
+    while search.step():
+        steps += 1
+        if stop is not None and steps % CHECK_INTERVAL == 0 and stop.is_set():
+            return None
+    space.trail = None
+    space.stats = None
+    return space if search.result else None
+
+
+def worker(  # noqa: PLR0913
+    factory: Factory,
+    seed: int,
+    stop: Event,
+    results: Queue[Outcome],
+    config: Config | None,
+    *,
+    collect: bool,
+) -> None:
+    """Solve in a worker process and put the outcome on the results queue."""
+    stats = Stats() if collect else None
+    space = solve_seed(factory, seed, stop, stats, config)
+    if not stop.is_set():
+        results.put((seed, space, stats))
+
+
+def solve_portfolio(
+    factory: Factory,
+    seeds: Iterable[int],
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> tuple[int | None, Space | None]:
+    """Solve a space from the factory with every seed in its own process.
+
+    The first solution wins, the other workers are then stopped. Stats of the
+    winner are merged into the given stats.
+
+    Returns the winning seed and solved space, or None and None if no seed
+    solved the space.
+    """
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    results: Queue[Outcome] = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(factory, seed, stop, results, config),
+            kwargs={"collect": stats is not None},
+        )
+        for seed in seeds
+    ]
+    for process in processes:
+        process.start()
+    winner: tuple[int | None, Space | None] = (None, None)
+    for _ in processes:
+        seed, space, collected = results.get()
+        if space is not None:
+            winner = (seed, space)
+            if stats is not None and collected is not None:
+                stats.merge(collected)
+            break
+    stop.set()
+    for process in processes:
+        process.join(JOIN_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    return winner
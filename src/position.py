@@ -45,6 +45,14 @@ class Position(ABC):
     def states(self: Position) -> Iterator[PositionState]:
         """All possible states."""
 
+    @abstractmethod
+    def save(self: Position) -> object:
+        """Return an opaque snapshot of the current states."""
+
+    @abstractmethod
+    def restore(self: Position, saved: object) -> None:
+        """Restore the states from a snapshot returned by `save`."""
+
 
 class DiscretePosition(Position):
     """A position represented by a list of booleans."""
@@ -97,6 +105,98 @@ class DiscretePosition(Position):
         """All possible states."""
         return (i for i, s in enumerate(self.vector) if s)
 
+    def save(self: DiscretePosition) -> list[bool]:
+        """Return an opaque snapshot of the current states."""
+        return self.vector.copy()
+
+    def restore(self: DiscretePosition, saved: object) -> None:
+        """Restore the states from a snapshot returned by `save`."""
+        self.vector = cast(list[bool], saved).copy()
+
     def __str__(self: DiscretePosition) -> str:
         """Return a string representation of this position."""
         return str(self.vector.index(True) + 1) if self.is_solved else " "
+
+
+class BitPosition(Position):
+    """A position represented by an integer bitmask with a cached popcount.
+
+    Bit `i` of the mask is set if the position can be in state `i`. Python
+    integers have arbitrary precision, so a single mask covers any domain size.
+    """
+
+    __slots__ = ("_count", "mask")
+
+    mask: int
+    _count: int
+
+    def __init__(
+        self: BitPosition,
+        mask: int | None = None,
+        size: int = 0,
+    ) -> None:
+        """Create position with given size or internal mask."""
+        self.mask = (1 << size) - 1 if mask is None else mask
+        self._count = self.mask.bit_count()
+
+    def copy(self: BitPosition) -> BitPosition:
+        """Return a deep copy of this position."""
+        return BitPosition(mask=self.mask)
+
+    @property
+    def count(self: BitPosition) -> int:
+        """Number of states this position could be in."""
+        return self._count
+
+    @property
+    def is_solved(self: BitPosition) -> bool:
+        """True if can only be in one state."""
+        return self._count == 1
+
+    def has(self: BitPosition, state: PositionState) -> bool:
+        """Return true if can be in the given state."""
+        return bool(self.mask >> cast(int, state) & 1)
+
+    def remove(self: BitPosition, states: Iterable[PositionState]) -> None:
+        """Remove the given states from the position."""
+        mask = 0
+        for state in cast(Iterable[int], states):
+            mask |= 1 << state
+        self.remove_mask(mask)
+
+    def remove_mask(self: BitPosition, mask: int) -> None:
+        """Remove all states set in the given mask from the position."""
+        self.mask &= ~mask
+        self._count = self.mask.bit_count()
+
+    def solve(self: BitPosition, state: PositionState) -> None:
+        """Remove all but one state from the position."""
+        self.mask &= 1 << cast(int, state)
+        self._count = 1 if self.mask else 0
+
+    @property
+    def state(self: BitPosition) -> int:
+        """Single state, assuming solved."""
+        return self.mask.bit_length() - 1
+
+    @property
+    def states(self: BitPosition) -> Iterator[int]:
+        """All possible states."""
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def save(self: BitPosition) -> int:
+        """Return an opaque snapshot of the current states."""
+        return self.mask
+
+    def restore(self: BitPosition, saved: object) -> None:
+        """Restore the states from a snapshot returned by `save`."""
+        self.mask = cast(int, saved)
+        self._count = self.mask.bit_count()
+
+    def __str__(self: BitPosition) -> str:
+        """Return a string representation of this position."""
+        return str(self.state + 1) if self.is_solved else " "
@@ -0,0 +1,134 @@
+"""Queues of positions waiting to be propagated.
+
+A space queues a position when its states are reduced, and the solver pops
+positions until the queue is empty. A position is queued at most once: pushing
+a position that is already waiting is skipped, as propagation reads its states
+when it is popped, not when it was pushed. The order in which waiting positions
+are popped is selected by name in `src.solver.Config`.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import deque
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.space import Space, SpaceIndex
+
+
+class PropagationQueue:
+    """First in, first out: positions propagate in the order they changed."""
+
+    entries: deque[SpaceIndex]
+    members: set[SpaceIndex]
+
+    def __init__(self: PropagationQueue) -> None:
+        """Create an empty queue."""
+        self.entries = deque()
+        self.members = set()
+
+    def copy(self: PropagationQueue) -> PropagationQueue:
+        """Return a copy of this queue, in the same order."""
+        queue = self.__class__()
+        queue.entries = self.entries.copy()
+        queue.members = self.members.copy()
+        return queue
+
+    def push(self: PropagationQueue, space: Space, index: SpaceIndex) -> None:
+        """Queue the position at index of the space, unless it is waiting."""
+        members = self.members
+        stats = space.stats
+        if index in members:
+            if stats is not None:
+                stats.queue_skips += 1
+            return
+        members.add(index)
+        self.add(space, index)
+        if stats is not None:
+            stats.queue_pushes += 1
+            stats.max_queue = max(stats.max_queue, len(members))
+
+    def add(self: PropagationQueue, space: Space, index: SpaceIndex) -> None:  # noqa: ARG002
+        """Add an index that is not waiting yet."""
+        self.entries.append(index)
+
+    def pop(self: PropagationQueue) -> SpaceIndex:
+        """Remove and return the next index to propagate, in constant time."""
+        index = self.entries.popleft()
+        self.members.discard(index)
+        return index
+
+    def clear(self: PropagationQueue) -> None:
+        """Remove all waiting indices."""
+        self.entries.clear()
+        self.members.clear()
+
+    def __len__(self: PropagationQueue) -> int:
+        """Return the number of waiting indices."""
+        return len(self.members)
+
+
+class LifoQueue(PropagationQueue):
+    """Last in, first out: the most recently changed position goes first.
+
+    This follows a chain of changes to its end before returning to earlier
+    ones, so a conflict deep in the chain is found sooner.
+    """
+
+    def pop(self: LifoQueue) -> SpaceIndex:
+        """Remove and return the most recently added index."""
+        index = self.entries.pop()
+        self.members.discard(index)
+        return index
+
+
+class DegreeQueue(PropagationQueue):
+    """Positions with the most unsolved neighbors first, then first in.
+
+    Neighbors are counted when a position is pushed. Propagating those first
+    removes the most states early, so conflicts are found with fewer pops.
+    """
+
+    heap: list[tuple[int, int, SpaceIndex]]
+    pushed: int
+
+    def __init__(self: DegreeQueue) -> None:
+        """Create an empty queue."""
+        super().__init__()
+        self.heap = []
+        self.pushed = 0
+
+    def copy(self: DegreeQueue) -> DegreeQueue:
+        """Return a copy of this queue, in the same order."""
+        queue = DegreeQueue()
+        queue.heap = self.heap.copy()
+        queue.members = self.members.copy()
+        queue.pushed = self.pushed
+        return queue
+
+    def add(self: DegreeQueue, space: Space, index: SpaceIndex) -> None:
+        """Add an index, ranked by its number of unsolved neighbors."""
+        degree = sum(
+            1 for other in space.neighbors(index) if not space.get(other).is_solved
+        )
+        self.pushed += 1
+        heapq.heappush(self.heap, (-degree, self.pushed, index))
+
+    def pop(self: DegreeQueue) -> SpaceIndex:
+        """Remove and return the index with the most unsolved neighbors."""
+        index = heapq.heappop(self.heap)[2]
+        self.members.discard(index)
+        return index
+
+    def clear(self: DegreeQueue) -> None:
+        """Remove all waiting indices."""
+        self.heap.clear()
+        self.members.clear()
+
+
+QUEUE_ORDERS: dict[str, type[PropagationQueue]] = {
+    "fifo": PropagationQueue,
+    "lifo": LifoQueue,
+    "degree": DegreeQueue,
+}
@@ -1,27 +1,60 @@
 """Solver for spaces.
 
 The solver uses a combination of constraint propagation and random assignment
-with backgracking if constraint propagation fails.
+with backgracking if constraint propagation fails. The search is iterative, so
+the depth of the search tree is not limited by the Python stack.
 """
 
 from __future__ import annotations
 
+import copy
 import random
-from typing import Callable
+import time
+from typing import TYPE_CHECKING, Callable, Iterator, TypeVar, cast
 
+from src.heuristics import VALUE_ORDERS, VARIABLE_ORDERS, ValueOrder, VariableOrder
+from src.nogoods import Nogoods
+from src.scheduler import QUEUE_ORDERS
 from src.space import Space, SpaceIndex
+from src.stats import Stats
+from src.transposition import TranspositionTable, Zobrist
+
+if TYPE_CHECKING:
+    from src.position import PositionState
 
 NOT_FOUND = object()
 Callback = Callable[[Space], None]
+S = TypeVar("S", bound=Space)
+
 
+def propagate_queue(space: Space, nogoods: Nogoods | None = None) -> bool:
+    """Propagate all positions listed in the queue into dependent positions.
 
-def propagate_queue(space: Space) -> bool:
-    """Propagate all solved states listed in the queue into dependent positions."""
-    while space.queue:
-        index = space.queue.pop(0)
-        if not space.propagate(index):
+    Once the queue is empty, the space can apply further inference, which may
+    add to the queue again. If nogoods are given, they are checked for every
+    solved position. On failure, the space keeps the position whose propagation
+    or nogood check failed, or None if inference failed.
+    """
+    while True:
+        while space.queue:
+            index = space.queue.pop()
+            if space.stats is not None:
+                space.stats.queue_pops += 1
+            if nogoods is not None and not nogoods.check(space, index):
+                space.failed = index
+                return False
+            if space.reasons is not None:
+                space.cause = space.explain(index)
+            if not space.propagate(index):
+                space.conflict |= space.cause
+                space.failed = index
+                return False
+        if not space.infer():
+            space.conflict |= space.cause
+            space.failed = None
             return False
-    return True
+        if not space.queue:
+            return True
 
 
 def ensure_edge(space: Space) -> None:
@@ -33,67 +66,546 @@ def ensure_edge(space: Space) -> None:
     """
     if not space.edge:
         indices = [index for index, _ in space.positions]
-        space.edge.add(random.choice(indices))
+        space.add_edge(random.choice(indices))
 
 
-def select_position(space: Space) -> SpaceIndex:
+def select_position(space: Space, order: VariableOrder | None = None) -> SpaceIndex:
     """Return unsolved position with the lowest number of states.
 
     This position is used to continue the solving process, by marking it as
     solved and recursively solving from there, backtracking if a conflict
-    arises..
+    arises. The edge keeps positions bucketed by number of states, so this does
+    not scan the edge. A variable order can select the position instead.
     """
     ensure_edge(space)
-    minimum = None
-    indices = []
-    for index in space.edge:
-        count = space.get(index).count
-        if (minimum is None or minimum >= count) and count > 1:
-            if minimum == count:
-                indices.append(index)
-            else:
-                minimum = count
-                indices = [index]
-    return random.choice(indices) if indices else NOT_FOUND
+    index = space.edge.select() if order is None else order.select(space)
+    return NOT_FOUND if index is None else index
 
 
-def solve_index(
-    space: Space,
-    index: SpaceIndex,
-    callback: Callback | None = None,
-) -> bool:
-    """Set the state for position at index and solve recursively.
+def luby(index: int) -> int:
+    """Return element index, counting from 1, of the Luby sequence 1 1 2 1 1 2 4."""
+    while True:
+        size = index.bit_length()
+        if index == (1 << size) - 1:
+            return 1 << (size - 1)
+        index -= (1 << (size - 1)) - 1
+
+
+class Restarts:
+    """Policy to restart the search from the root after a budget is spent.
+
+    Randomized search times are heavy-tailed, a bad early choice can trap the
+    search for a long time. Restarting with a growing budget cuts off that tail.
+    The budget of attempt i is `base * luby(i)` or `base * factor ** (i - 1)`,
+    counted in nodes or backtracks.
+    """
+
+    SCHEDULES = ("luby", "geometric")
+    UNITS = ("backtracks", "nodes")
+
+    base: int
+    schedule: str
+    factor: float
+    unit: str
+
+    def __init__(
+        self: Restarts,
+        base: int = 100,
+        schedule: str = "luby",
+        factor: float = 1.5,
+        unit: str = "backtracks",
+    ) -> None:
+        """Create a restart policy."""
+        if schedule not in self.SCHEDULES or unit not in self.UNITS:
+            raise ValueError
+        self.base = base
+        self.schedule = schedule
+        self.factor = factor
+        self.unit = unit
+
+    def cutoff(self: Restarts, attempt: int) -> int:
+        """Return the budget of the given attempt, counting from 1."""
+        if self.schedule == "luby":
+            return self.base * luby(attempt)
+        return int(self.base * self.factor ** (attempt - 1))
+
+
+class Config:
+    """Options of the search, set per script from the command line.
+
+    Backjumping, nogoods and the transposition table need a space with a
+    trail, and are ignored otherwise. Nogoods sets the size of the nogood store,
+    and implies backjumping. Table sets the size of the transposition table.
+    Rules names the extra inference rules of spaces that have them. Variable
+    and value name the ordering heuristics, see `src.heuristics`. Queue names
+    the order of propagation, see `src.scheduler`. Heuristics and orders are
+    given by name rather than as objects, so a configuration can be passed to
+    worker processes.
+    """
+
+    restarts: Restarts | None
+    backjump: bool
+    nogoods: int
+    table: int
+    rules: tuple[str, ...]
+    variable: str
+    value: str
+    queue: str
+
+    def __init__(  # noqa: PLR0913
+        self: Config,
+        restarts: Restarts | None = None,
+        *,
+        backjump: bool = False,
+        nogoods: int = 0,
+        table: int = 0,
+        rules: tuple[str, ...] = (),
+        variable: str = "mrv",
+        value: str = "random",
+        queue: str = "fifo",
+    ) -> None:
+        """Create a search configuration."""
+        if (
+            variable not in VARIABLE_ORDERS
+            or value not in VALUE_ORDERS
+            or queue not in QUEUE_ORDERS
+        ):
+            raise ValueError
+        self.restarts = restarts
+        self.backjump = backjump or nogoods > 0
+        self.nogoods = nogoods
+        self.table = table
+        self.rules = rules
+        self.variable = variable
+        self.value = value
+        self.queue = queue
+
+    def exhaustive(self: Config) -> Config:
+        """Return a copy without restarts, for searches that visit every branch.
+
+        Restarts would revisit branches, and drop branches handed off to other
+        searches.
+        """
+        config = copy.copy(self)
+        config.restarts = None
+        return config
+
+
+class ChoicePoint:
+    """A position with the states that are still to be tried.
+
+    When backjumping, conflicts collects the decision levels that caused the
+    states tried so far to fail, and state is the state being tried. Once a
+    state led to a solution or was handed off, conflicts no longer explains a
+    failure and the point is not exact. Key is the hash of the space at the
+    choice point, if hashed.
+    """
+
+    index: SpaceIndex
+    states: list[PositionState]
+    checkpoint: int
+    parent: Space | None
+    state: PositionState
+    conflicts: int
+    exact: bool
+    key: int
+
+    def __init__(
+        self: ChoicePoint,
+        index: SpaceIndex,
+        states: list[PositionState],
+        checkpoint: int = 0,
+        parent: Space | None = None,
+    ) -> None:
+        """Create a choice point, with states in the order they are tried."""
+        self.index = index
+        self.states = states[::-1]
+        self.checkpoint = checkpoint
+        self.parent = parent
+        self.state = None
+        self.conflicts = 0
+        self.exact = True
+        self.key = 0
+
+
+class Search:
+    """Depth-first search over a space, using an explicit stack of choice points.
 
     After all propagations have completed there can still be unsolved positions.
-    To address this, we duplicate the space, assume a solution at this given
-    index, and try to solving from there. If we run into a conflict, we discard
-    the space.
+    To address this, we assume a solution at an unsolved position, and try
+    solving from there. If we run into a conflict, we undo the assumption and
+    try the next state. Spaces with a trail are rolled back to a checkpoint,
+    other spaces are duplicated for every state tried.
 
-    Returns True if the space is solved, False otherwise.
+    The search advances one node per `step`, so a caller can drive it
+    incrementally and stop at any time. With a restart policy, the search
+    returns to the root once the budget of an attempt is spent.
+
+    With backjumping, the space records which decisions caused each conflict,
+    and the search skips choice points that played no part in it. The choice
+    point at level i is the decision with bit i in a conflict bitmask.
+
+    With a transposition table, the space is hashed, and spaces found to have
+    no solution are remembered. Reaching such a space again, for example after
+    a restart, counts as a conflict. Spaces are looked up both before and after
+    propagation, the latter to skip subtrees that were searched before.
     """
-    states = list(space.get(index).states)
-    random.shuffle(states)
-    for state in states:
+
+    space: Space
+    current: Space
+    callback: Callback | None
+    stack: list[ChoicePoint]
+    result: bool | None
+    stats: Stats | None
+    restarts: Restarts | None
+    attempt: int
+    spent: int
+    backjumping: bool
+    nogoods: Nogoods | None
+    table: TranspositionTable | None
+    variables: VariableOrder
+    values: ValueOrder
+
+    def __init__(
+        self: Search,
+        space: Space,
+        callback: Callback | None = None,
+        stats: Stats | None = None,
+        config: Config | None = None,
+    ) -> None:
+        """Create a search that solves the given space in place.
+
+        If stats are given, they are attached to the space and updated as the
+        search progresses.
+        """
+        self.space = space
+        self.current = space
+        self.callback = callback
+        self.stack = []
+        self.result = None
+        self.stats = stats
+        space.stats = stats
+        self.restarts = config.restarts if config is not None else None
+        self.attempt = 1
+        self.spent = 0
+        self.backjumping = (
+            config is not None and config.backjump and space.trail is not None
+        )
+        self.nogoods = None
+        if self.backjumping:
+            space.start_reasons()
+            if config is not None and config.nogoods:
+                self.nogoods = Nogoods(config.nogoods)
+        self.variables = VARIABLE_ORDERS[config.variable if config else "mrv"]()
+        self.values = VALUE_ORDERS[config.value if config else "random"]()
+        queue = QUEUE_ORDERS[config.queue if config else "fifo"]
+        if type(space.queue) is not queue:
+            space.use_queue(queue())
+        self.table = None
+        if config is not None and config.table and space.trail is not None:
+            space.start_hash(Zobrist())
+            self.table = TranspositionTable(config.table)
+
+    def step(self: Search) -> bool:
+        """Process a single node of the search tree.
+
+        First propagate all solved positions listed in the queue. Then find the
+        unsolved position with minimal number of states and assign a random state
+        to continue from.
+
+        Returns True if the search should continue, False once it is finished.
+        """
+        if self.result is not None:
+            return False
+        if self.callback is not None:
+            self.callback(self.current)
+        if self.stats is not None:
+            self.stats.nodes += 1
+            self.stats.max_depth = max(self.stats.max_depth, len(self.stack))
+        key = self.current.hash
+        consistent = (
+            self.lookup(key) and self.propagate() and self.lookup(self.current.hash)
+        )
+        if consistent:
+            index = self.select()
+            if index == NOT_FOUND:
+                if self.current is not self.space:
+                    self.space.assign(self.current)
+                self.result = True
+                return False
+            self.push(index)
+        else:
+            self.fail(key)
+        if self.restarts is not None and self.spend(conflict=not consistent):
+            self.restart()
+            return True
+        if not self.branch():
+            self.result = False
+            return False
+        return True
+
+    def resume(self: Search) -> None:
+        """Continue the search after a solution was found, to find the next one."""
+        if self.result:
+            if self.backjumping:
+                for level, point in enumerate(self.stack, 1):
+                    point.conflicts |= (1 << level) - 2
+                    point.exact = False
+            self.result = None if self.branch() else False
+
+    def split(self: Search) -> Space | None:
+        """Take the shallowest untried branch out of this search.
+
+        Returns a space with that branch applied, to be searched elsewhere, or
+        None if there are no untried branches.
+        """
+        for level, point in enumerate(self.stack, 1):
+            if point.states:
+                state = point.states.pop(0)
+                point.conflicts |= (1 << level) - 2
+                point.exact = False
+                if point.parent is None:
+                    space = self.current.snapshot(point.checkpoint)
+                else:
+                    space = point.parent.copy()
+                space.solve(point.index, state)
+                return space
+        return None
+
+    def spend(self: Search, *, conflict: bool) -> bool:
+        """Account a node against the restart budget.
+
+        Returns True if the budget of the current attempt is spent.
+        """
+        if self.restarts is None:
+            return False
+        if conflict or self.restarts.unit == "nodes":
+            self.spent += 1
+        return bool(self.stack) and self.spent >= self.restarts.cutoff(self.attempt)
+
+    def restart(self: Search) -> None:
+        """Return to the root of the search tree, to try again from there.
+
+        The root is the state after the first propagation, where the first
+        choice point was opened.
+        """
+        root = self.stack[0]
+        if root.parent is None:
+            self.current.rollback(root.checkpoint)
+        else:
+            self.current = self.copy(root.parent)
+        self.stack.clear()
+        self.attempt += 1
+        self.spent = 0
+        if self.stats is not None:
+            self.stats.restarts += 1
+
+    def lookup(self: Search, key: int) -> bool:
+        """Return False if the space with the given hash has no solution."""
+        if self.table is None:
+            return True
+        known = self.table.known(key)
+        if self.stats is not None:
+            if known:
+                self.stats.table_hits += 1
+                self.stats.backtracks += 1
+            else:
+                self.stats.table_misses += 1
+        if known:
+            self.current.conflict = (1 << (len(self.stack) + 1)) - 2
+            self.current.failed = None
+        return not known
+
+    def fail(self: Search, key: int) -> None:
+        """Remember the space with the given hash, and backjump if enabled."""
+        if self.table is not None:
+            self.table.add(key)
+        self.variables.conflict(self.current)
+        if self.backjumping:
+            self.backjump(self.current.conflict)
+
+    def propagate(self: Search) -> bool:
+        """Propagate the queue of the current space, timed if stats are kept."""
+        self.current.conflict = 0
+        self.current.failed = None
+        if self.stats is None:
+            return propagate_queue(self.current, self.nogoods)
+        start = time.perf_counter()
+        result = propagate_queue(self.current, self.nogoods)
+        self.stats.propagate_time += time.perf_counter() - start
+        self.stats.propagations += 1
+        if not result:
+            self.stats.backtracks += 1
+        return result
+
+    def select(self: Search) -> SpaceIndex:
+        """Select the next position to branch on, timed if stats are kept."""
+        if self.stats is None:
+            return select_position(self.current, self.variables)
+        start = time.perf_counter()
+        index = select_position(self.current, self.variables)
+        self.stats.select_time += time.perf_counter() - start
+        return index
+
+    def copy(self: Search, space: Space) -> Space:
+        """Return a copy of the given space, timed if stats are kept."""
+        if self.stats is None:
+            return space.copy()
+        start = time.perf_counter()
         copy = space.copy()
-        copy.solve(index, state)
-        if solve_space(copy, callback):
-            space.assign(copy)
+        copy.stats = self.stats
+        self.stats.copy_time += time.perf_counter() - start
+        self.stats.copies += 1
+        return copy
+
+    def push(self: Search, index: SpaceIndex) -> None:
+        """Open a choice point for the position at index."""
+        states = self.values.order(self, index, list(self.current.get(index).states))
+        if self.current.trail is not None:
+            point = ChoicePoint(index, states, checkpoint=self.current.checkpoint())
+            point.key = self.current.hash
+            if self.current.reasons is not None:
+                point.conflicts = self.current.reasons.get(index, 0)
+            self.stack.append(point)
+        else:
+            parent = self.current
+            if parent is self.space:
+                parent = self.copy(parent)
+            self.stack.append(ChoicePoint(index, states, parent=parent))
+
+    def branch(self: Search) -> bool:
+        """Continue with the next untried state, backtracking where needed.
+
+        Returns False if all states have been tried.
+        """
+        while self.stack:
+            point = self.stack[-1]
+            if point.parent is None:
+                self.current.rollback(point.checkpoint)
+            if not point.states:
+                self.stack.pop()
+                if self.table is not None and point.exact:
+                    self.table.add(point.key)
+                if self.backjumping:
+                    self.backjump(point.conflicts, learn=point.exact)
+                continue
+            if point.parent is not None:
+                self.current = self.copy(point.parent)
+            point.state = point.states.pop()
+            self.values.decided(point.index, point.state)
+            self.current.cause = 1 << len(self.stack)
+            self.current.solve(point.index, point.state)
             return True
-    return False
+        return False
+
+    def backjump(self: Search, conflict: int, *, learn: bool = True) -> None:
+        """Drop the choice points that played no part in a conflict.
 
+        The deepest choice point in the conflict keeps the rest of it, to jump
+        back further once all its states have failed. A conflict without any
+        decision means there is no solution, and the stack is cleared. Without
+        learn, the conflict is not recorded as a nogood.
+        """
+        if learn:
+            self.learn(conflict)
+        stack = self.stack
+        while stack and not conflict >> len(stack) & 1:
+            stack.pop()
+            if self.stats is not None:
+                self.stats.backjumps += 1
+        if stack:
+            stack[-1].conflicts |= conflict & ~(1 << len(stack))
+            stack[-1].exact = stack[-1].exact and learn
 
-def solve_space(space: Space, callback: Callback | None = None) -> bool:
-    """Solve all positions in the space recursively.
+    def learn(self: Search, conflict: int) -> None:
+        """Record the decisions of a conflict as a nogood."""
+        literals = tuple(
+            (point.index, point.state)
+            for level, point in enumerate(self.stack, 1)
+            if conflict >> level & 1
+        )
+        if self.nogoods is None or not literals:
+            return
+        self.nogoods.add(literals)
+        if self.stats is not None:
+            self.stats.nogoods += 1
 
-    First propagate all solved positions listed in the queue. Then find the
-    unsolved position with minimal number of states and assign a random state to
-    recursively solve from.
+
+def solve_space(
+    space: Space,
+    callback: Callback | None = None,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> bool:
+    """Solve all positions in the space, updating stats if given.
 
     Returns True if the space is solved, False otherwise.
     """
-    if callback is not None:
-        callback(space)
-    if not propagate_queue(space):
-        return False
-    index = select_position(space)
-    return index == NOT_FOUND or solve_index(space, index, callback)
+    search = Search(space, callback, stats, config)
+    while search.step():
+        pass
+    return bool(search.result)
+
+
+def iter_search(search: Search, limit: int | None = None) -> Iterator[Space]:
+    """Run the search, yielding its current space at every solution.
+
+    The yielded space is changed as soon as the search continues.
+    """
+    found = 0
+    while limit is None or found < limit:
+        while search.step():
+            pass
+        if not search.result:
+            return
+        found += 1
+        yield search.current
+        search.resume()
+
+
+def iter_solutions(
+    space: S,
+    limit: int | None = None,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> Iterator[S]:
+    """Yield a copy of every solution of the space, up to limit solutions.
+
+    Solutions are found one at a time, keeping only the current branch of the
+    search in memory. A space with a trail is searched in place, and rolled
+    back as the search continues. Otherwise, the space is left unchanged.
+    """
+    if space.trail is None:
+        space = cast(S, space.copy())
+    search = Search(space, stats=stats, config=config and config.exhaustive())
+    for solution in iter_search(search, limit):
+        yield cast(S, solution.copy())
+
+
+def count_solutions(
+    space: Space,
+    limit: int | None = None,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> int:
+    """Return the number of solutions of the space, counting up to limit.
+
+    Like `iter_solutions`, without copying solutions. A limit of 2 checks if
+    the solution is unique.
+    """
+    if space.trail is None:
+        space = space.copy()
+    search = Search(space, stats=stats, config=config and config.exhaustive())
+    return sum(1 for _ in iter_search(search, limit))
+
+
+def solve_space_stats(
+    space: Space,
+    callback: Callback | None = None,
+) -> tuple[bool, Stats]:
+    """Solve all positions in the space, collecting stats.
+
+    Returns whether the space is solved, and the stats of the solve.
+    """
+    stats = Stats()
+    return solve_space(space, callback, stats), stats
@@ -2,21 +2,135 @@
 
 from __future__ import annotations
 
+import random
+import struct
 from abc import ABC, abstractmethod
-from typing import Iterable, Iterator, Protocol, cast
+from functools import cache
+from typing import TYPE_CHECKING, Iterable, Iterator, Protocol, cast
 
-from src.position import DiscretePosition, Position, PositionState
+from src.position import BitPosition, Position, PositionState
+from src.scheduler import PropagationQueue
+
+if TYPE_CHECKING:
+    from src.stats import Stats
+    from src.transposition import Zobrist
 
 
 class SpaceIndex(Protocol):
     """An index of a position in a space."""
 
 
+class Edge:
+    """Set of unsolved positions to continue solving from.
+
+    Indices are kept in buckets by their number of states, so a position with
+    the lowest number of states can be found without scanning the whole set.
+    """
+
+    buckets: list[list[SpaceIndex]]
+    slots: dict[SpaceIndex, tuple[int, int]]
+
+    def __init__(
+        self: Edge,
+        buckets: list[list[SpaceIndex]] | None = None,
+        slots: dict[SpaceIndex, tuple[int, int]] | None = None,
+    ) -> None:
+        """Create an empty edge or one with the given buckets."""
+        self.buckets = [] if buckets is None else buckets
+        self.slots = {} if slots is None else slots
+
+    def copy(self: Edge) -> Edge:
+        """Return a copy of this edge."""
+        return Edge(
+            buckets=[bucket.copy() for bucket in self.buckets],
+            slots=self.slots.copy(),
+        )
+
+    def add(self: Edge, index: SpaceIndex, count: int) -> None:
+        """Add the index, or move it to the bucket of its new count."""
+        slot = self.slots.get(index)
+        if slot is not None:
+            if slot[0] == count:
+                return
+            self.discard(index)
+        while len(self.buckets) <= count:
+            self.buckets.append([])
+        bucket = self.buckets[count]
+        self.slots[index] = (count, len(bucket))
+        bucket.append(index)
+
+    def discard(self: Edge, index: SpaceIndex) -> None:
+        """Remove the index if present."""
+        slot = self.slots.pop(index, None)
+        if slot is None:
+            return
+        count, i = slot
+        bucket = self.buckets[count]
+        last = bucket.pop()
+        if i < len(bucket):
+            bucket[i] = last
+            self.slots[last] = (count, i)
+
+    def select(self: Edge) -> SpaceIndex | None:
+        """Return a random unsolved index with the lowest number of states."""
+        for bucket in self.buckets[2:]:
+            if bucket:
+                return random.choice(bucket)
+        return None
+
+    def __contains__(self: Edge, index: object) -> bool:
+        """Return true if the index is in the edge."""
+        return index in self.slots
+
+    def __iter__(self: Edge) -> Iterator[SpaceIndex]:
+        """Iterate over all indices in the edge."""
+        return iter(self.slots)
+
+    def __len__(self: Edge) -> int:
+        """Return the number of indices in the edge."""
+        return len(self.slots)
+
+
+TrailEntry = tuple[SpaceIndex, object, bool, int, int]
+DUMP_HEADER = struct.Struct("<II")
+UNSOLVED_BYTE = 255
+
+
+def state_mask(states: Iterable[PositionState]) -> int:
+    """Return a bitmask with a bit set for every state, as int."""
+    mask = 0
+    for state in cast(Iterable[int], states):
+        mask |= 1 << state
+    return mask
+
+
 class Space(ABC):
-    """An abstract space."""
+    """An abstract space.
 
-    queue: list[SpaceIndex]
-    edge: set[SpaceIndex]
+    A space can optionally keep a trail, an undo log of every position change
+    made through `solve` and `remove`. This allows a solver to take a
+    checkpoint before trying a state and roll back to it on failure, instead of
+    copying the whole space.
+
+    A space with a trail can also keep reasons, for every position the decision
+    levels that caused its states to be removed, as a bitmask. Changes are
+    attributed to the levels in `cause`, and a failing change records the
+    levels responsible in `conflict`.
+
+    A space with a trail can also keep a Zobrist hash of all its states, updated
+    on every change and restored on rollback.
+    """
+
+    queue: PropagationQueue
+    edge: Edge
+    trail: list[TrailEntry] | None = None
+    stats: Stats | None = None
+    reasons: dict[SpaceIndex, int] | None = None
+    cause: int = 0
+    conflict: int = 0
+    failed: SpaceIndex | None = None
+    zobrist: Zobrist | None = None
+    hash: int = 0
 
     @abstractmethod
     def copy(self: Space) -> Space:
@@ -43,17 +157,151 @@ class Space(ABC):
         reduction in states in one position impacts states in other positions
         """
 
+    def infer(self: Space) -> bool:
+        """Apply further inference once the queue has been propagated.
+
+        Spaces can override this to remove states that propagation of single
+        positions does not catch. Solved positions are added to the queue, to
+        be propagated before inference is applied again.
+
+        Returns False if a conflict is found.
+        """
+        return True
+
+    def neighbors(self: Space, index: SpaceIndex) -> Iterable[SpaceIndex]:  # noqa: ARG002
+        """Return the indices of positions that share a constraint with index."""
+        return ()
+
+    def use_queue(self: Space, queue: PropagationQueue) -> None:
+        """Schedule propagation with the given queue, moving waiting positions."""
+        while self.queue:
+            queue.push(self, self.queue.pop())
+        self.queue = queue
+
+    def start_trail(self: Space) -> None:
+        """Start recording changes, so they can be rolled back."""
+        self.trail = []
+
+    def start_reasons(self: Space) -> None:
+        """Start recording which decision levels caused each change."""
+        self.reasons = {}
+
+    def start_hash(self: Space, zobrist: Zobrist) -> None:
+        """Start keeping a hash of all states, using the given keys."""
+        self.zobrist = zobrist
+        self.hash = 0
+        for index, position in self.positions:
+            self.hash ^= zobrist.delta(index, state_mask(position.states))
+
+    def scope(self: Space, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        """Return the indices of positions read when propagating from index.
+
+        Spaces whose propagation reads more than the position itself override
+        this, so conflicts are attributed to all decisions involved.
+        """
+        return (index,)
+
+    def explain(self: Space, index: SpaceIndex) -> int:
+        """Return the decision levels that led to propagating from index."""
+        reasons = self.reasons
+        if reasons is None:
+            return 0
+        levels = 0
+        for other in self.scope(index):
+            levels |= reasons.get(other, 0)
+        return levels
+
+    def blame(self: Space, index: SpaceIndex) -> bool:
+        """Add the reasons of a position that ran out of states to the conflict.
+
+        Returns False, to be returned by the failing change.
+        """
+        if self.reasons is not None:
+            self.conflict |= self.reasons.get(index, 0) | self.cause
+        return False
+
+    def checkpoint(self: Space) -> int:
+        """Return a marker of the current state to roll back to.
+
+        Checkpoints are expected to be taken with an empty queue, i.e. after all
+        propagation has completed.
+        """
+        if self.trail is None:
+            raise ValueError
+        return len(self.trail)
+
+    def rollback(self: Space, checkpoint: int) -> None:
+        """Undo all changes made since the given checkpoint."""
+        if self.trail is None:
+            raise ValueError
+        if self.stats is not None:
+            self.stats.rollbacks += 1
+        trail = self.trail
+        while len(trail) > checkpoint:
+            self.undo(trail.pop())
+        self.queue.clear()
+
+    def snapshot(self: Space, checkpoint: int) -> Space:
+        """Return a copy of this space as it was at the given checkpoint.
+
+        The copy has no trail, and this space is left unchanged.
+        """
+        if self.trail is None:
+            raise ValueError
+        copy = self.copy()
+        for entry in reversed(self.trail[checkpoint:]):
+            copy.undo(entry)
+        copy.queue.clear()
+        return copy
+
+    def undo(self: Space, entry: TrailEntry) -> None:
+        """Restore the position and edge membership recorded in a trail entry."""
+        index, saved, in_edge, reason, self.hash = entry
+        self.get(index).restore(saved)
+        if self.reasons is not None:
+            self.reasons[index] = reason
+        if in_edge:
+            self.add_edge(index)
+        else:
+            self.edge.discard(index)
+
+    def add_edge(self: Space, index: SpaceIndex) -> None:
+        """Mark the position at index as a candidate to continue solving from."""
+        self.edge.add(index, int(self.get(index).count))
+
+    def record(self: Space, index: SpaceIndex, position: Position) -> None:
+        """Record the position at index in the trail, before changing it.
+
+        With reasons, the change is attributed to the current cause.
+        """
+        if self.trail is not None:
+            reasons = self.reasons
+            reason = 0 if reasons is None else reasons.get(index, 0)
+            self.trail.append(
+                (index, position.save(), index in self.edge, reason, self.hash),
+            )
+            if reasons is not None:
+                reasons[index] = reason | self.cause
+
     def solve(self: Space, index: SpaceIndex, state: PositionState) -> bool:
         """Set a single state to the position at the given index.
 
         By setting to a single state, we can propagate into dependent positions,
         further reducing state
         """
+        if self.stats is not None:
+            self.stats.solves += 1
         position = self.get(index)
+        self.record(index, position)
+        if self.zobrist is not None:
+            self.hash ^= self.zobrist.delta(
+                index,
+                state_mask(s for s in position.states if s != state),
+            )
         position.solve(state)
         if not position.is_solved:
-            return False
-        self.queue.append(index)
+            return self.blame(index)
+        self.queue.push(self, index)
         self.edge.discard(index)
         return True
 
@@ -63,44 +311,50 @@ class Space(ABC):
         If this results in a single state, we propagate into dependent positions.
         """
         position = self.get(index)
-        for state in states:
-            if not position.has(state):
-                continue
-            if position.is_solved:
-                return False
-            position.remove([state])
-            if position.is_solved:
-                self.queue.append(index)
-                self.edge.remove(index)
-            else:
-                self.edge.add(index)
+        present = {state for state in states if position.has(state)}
+        if not present:
+            return True
+        if len(present) >= position.count:
+            return self.blame(index)
+        self.record(index, position)
+        if self.zobrist is not None:
+            self.hash ^= self.zobrist.delta(index, state_mask(present))
+        position.remove(present)
+        self.reduced(index, position)
         return True
 
+    def reduced(self: Space, index: SpaceIndex, position: Position) -> None:
+        """Update queue and edge after states were removed from a position."""
+        if self.stats is not None:
+            self.stats.removes += 1
+        if position.is_solved:
+            self.queue.push(self, index)
+            self.edge.discard(index)
+        else:
+            self.edge.add(index, int(position.count))
+
 
 class PlanarSpace(Space):
     """A 2D space."""
 
-    matrix: list[list[DiscretePosition]]
+    matrix: list[list[BitPosition]]
 
     def __init__(  # noqa: PLR0913
         self: PlanarSpace,
-        matrix: list[list[DiscretePosition]] | None = None,
-        queue: list[SpaceIndex] | None = None,
-        edge: set[SpaceIndex] | None = None,
+        matrix: list[list[BitPosition]] | None = None,
+        queue: PropagationQueue | None = None,
+        edge: Edge | None = None,
         count: int = 0,
         size: tuple[int, int] = (0, 0),
     ) -> None:
         """Create a space with the given matrix or size."""
         self.matrix = (
-            [
-                [DiscretePosition(size=count) for x in range(size[0])]
-                for y in range(size[1])
-            ]
+            [[BitPosition(size=count) for x in range(size[0])] for y in range(size[1])]
             if matrix is None
             else matrix
         )
-        self.queue = [] if queue is None else queue
-        self.edge = set() if edge is None else edge
+        self.queue = PropagationQueue() if queue is None else queue
+        self.edge = Edge() if edge is None else edge
 
     def copy(self: PlanarSpace) -> PlanarSpace:
         """Return a deep copy of this space."""
@@ -118,6 +372,32 @@ class PlanarSpace(Space):
         self.queue = right.queue
         self.edge = right.edge
 
+    @property
+    def size(self: PlanarSpace) -> tuple[int, int]:
+        """Width and height of the space."""
+        return (len(self.matrix[0]) if self.matrix else 0, len(self.matrix))
+
+    def neighbors(self: PlanarSpace, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        """Return the indices of the horizontal and vertical neighbors."""
+        x, y = cast(tuple[int, int], index)
+        width, height = self.size
+        return [
+            (x + dx, y + dy)
+            for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            if 0 <= x + dx < width and 0 <= y + dy < height
+        ]
+
+    def dump(self: PlanarSpace) -> bytes:
+        """Return width and height, followed by one state byte per position.
+
+        Positions are listed row by row, unsolved positions as 255.
+        """
+        return DUMP_HEADER.pack(*self.size) + bytes(
+            position.state if position.is_solved else UNSOLVED_BYTE
+            for row in self.matrix
+            for position in row
+        )
+
     @property
     def positions(self: PlanarSpace) -> Iterator[tuple[tuple[int, int], Position]]:
         """Iterator over all index-positions pairs in the space."""
@@ -127,7 +407,135 @@ class PlanarSpace(Space):
             for x, position in enumerate(row)
         )
 
-    def get(self: PlanarSpace, index: SpaceIndex) -> DiscretePosition:
+    def get(self: PlanarSpace, index: SpaceIndex) -> BitPosition:
         """Return the position at the given index."""
         x, y = cast(tuple[int, int], index)
         return self.matrix[y][x]
+
+    def index(self: PlanarSpace, x: int, y: int) -> SpaceIndex:
+        """Return the index of the position at the given coordinates."""
+        return (x, y)
+
+    def remove(
+        self: PlanarSpace,
+        index: SpaceIndex,
+        states: Iterable[PositionState],
+    ) -> bool:
+        """Remove the given states from the position at the given index."""
+        return self.remove_mask(index, state_mask(states))
+
+    def remove_mask(self: PlanarSpace, index: SpaceIndex, mask: int) -> bool:
+        """Remove all states set in the mask from the position at the given index.
+
+        Returns False if this would leave the position without any state.
+        """
+        position = self.get(index)
+        hit = position.mask & mask
+        if not hit:
+            return True
+        if hit == position.mask:
+            return self.blame(index)
+        self.record(index, position)
+        if self.zobrist is not None:
+            self.hash ^= self.zobrist.delta(index, hit)
+        position.remove_mask(hit)
+        self.reduced(index, position)
+        return True
+
+
+Sides = tuple[int, int, int, int]
+
+
+@cache
+def grid_sides(width: int, height: int) -> tuple[Sides, ...]:
+    """Return the left, right, up and down cell ids of every cell, -1 if none."""
+    return tuple(
+        (
+            y * width + x - 1 if x > 0 else -1,
+            y * width + x + 1 if x < width - 1 else -1,
+            (y - 1) * width + x if y > 0 else -1,
+            (y + 1) * width + x if y < height - 1 else -1,
+        )
+        for y in range(height)
+        for x in range(width)
+    )
+
+
+@cache
+def grid_neighbors(width: int, height: int) -> tuple[tuple[int, ...], ...]:
+    """Return the horizontal and vertical neighbor ids of every cell."""
+    return tuple(
+        tuple(other for other in sides if other >= 0)
+        for sides in grid_sides(width, height)
+    )
+
+
+class GridSpace(PlanarSpace):
+    """A 2D space indexed by dense integer cell ids.
+
+    Cell y * width + x is kept in a flat list, so getting a position needs no
+    tuple unpacking, and ids hash cheaply in the edge, queue and trail. The
+    matrix holds the same positions row by row, for code that works with
+    coordinates, like loading and drawing. Neighbor ids are computed once per
+    size and shared by all spaces of that size.
+    """
+
+    cells: list[BitPosition]
+    sides: tuple[Sides, ...]
+    adjacent: tuple[tuple[int, ...], ...]
+
+    def __init__(  # noqa: PLR0913
+        self: GridSpace,
+        cells: list[BitPosition] | None = None,
+        queue: PropagationQueue | None = None,
+        edge: Edge | None = None,
+        count: int = 0,
+        size: tuple[int, int] = (0, 0),
+    ) -> None:
+        """Create a space with the given cells or count states per cell."""
+        width, height = size
+        if cells is None:
+            cells = [BitPosition(size=count) for _ in range(width * height)]
+        super().__init__(
+            matrix=[cells[y * width : (y + 1) * width] for y in range(height)],
+            queue=queue,
+            edge=edge,
+        )
+        self.cells = cells
+        self.sides = grid_sides(width, height)
+        self.adjacent = grid_neighbors(width, height)
+
+    def copy(self: GridSpace) -> GridSpace:
+        """Return a deep copy of this space."""
+        return self.__class__(
+            cells=[position.copy() for position in self.cells],
+            queue=self.queue.copy(),
+            edge=self.edge.copy(),
+            size=self.size,
+        )
+
+    def assign(self: GridSpace, right: Space) -> None:
+        """Assign the given space to this space."""
+        if not isinstance(right, GridSpace):
+            raise TypeError
+        super().assign(right)
+        self.cells = right.cells
+        self.sides = right.sides
+        self.adjacent = right.adjacent
+
+    def neighbors(self: GridSpace, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        """Return the ids of the horizontal and vertical neighbors."""
+        return self.adjacent[cast(int, index)]
+
+    @property
+    def positions(self: GridSpace) -> Iterator[tuple[int, Position]]:  # type: ignore[override]
+        """Iterator over all id-position pairs in the space."""
+        return enumerate(self.cells)
+
+    def get(self: GridSpace, index: SpaceIndex) -> BitPosition:
+        """Return the position with the given id."""
+        return self.cells[cast(int, index)]
+
+    def index(self: GridSpace, x: int, y: int) -> SpaceIndex:
+        """Return the id of the position at the given coordinates."""
+        return y * len(self.matrix[0]) + x
@@ -0,0 +1,94 @@
+"""Statistics collected while solving."""
+
+from __future__ import annotations
+
+COUNTERS = (
+    "nodes",
+    "backtracks",
+    "max_depth",
+    "propagations",
+    "queue_pops",
+    "queue_pushes",
+    "queue_skips",
+    "max_queue",
+    "solves",
+    "removes",
+    "copies",
+    "rollbacks",
+    "restarts",
+    "backjumps",
+    "nogoods",
+    "nogood_prunes",
+    "table_hits",
+    "table_misses",
+)
+MAXIMA = ("max_depth", "max_queue")
+TIMERS = (
+    "propagate_time",
+    "select_time",
+    "copy_time",
+)
+
+
+class Stats:
+    """Counters and timings of a solve.
+
+    The solver and spaces only update stats if one is attached, so collecting
+    them can be switched off by not passing one. Rules counts the states
+    removed by each inference rule of a space.
+    """
+
+    nodes: int
+    backtracks: int
+    max_depth: int
+    propagations: int
+    queue_pops: int
+    queue_pushes: int
+    queue_skips: int
+    max_queue: int
+    solves: int
+    removes: int
+    copies: int
+    rollbacks: int
+    restarts: int
+    backjumps: int
+    nogoods: int
+    nogood_prunes: int
+    table_hits: int
+    table_misses: int
+    propagate_time: float
+    select_time: float
+    copy_time: float
+    rules: dict[str, int]
+
+    def __init__(self: Stats) -> None:
+        """Create stats with all counters and timers at zero."""
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        for name in TIMERS:
+            setattr(self, name, 0.0)
+        self.rules = {}
+
+    def merge(self: Stats, other: Stats) -> None:
+        """Add the counters and timers of other to these stats, maxima are kept."""
+        for name in COUNTERS + TIMERS:
+            if name in MAXIMA:
+                setattr(self, name, max(getattr(self, name), getattr(other, name)))
+            else:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name, count in other.rules.items():
+            self.rules[name] = self.rules.get(name, 0) + count
+
+    def as_dict(self: Stats) -> dict[str, float]:
+        """Return all counters and timers by name."""
+        return {
+            **{name: getattr(self, name) for name in COUNTERS + TIMERS},
+            **{f"rule_{name}": count for name, count in self.rules.items()},
+        }
+
+    def __str__(self: Stats) -> str:
+        """Return one line per counter and timer."""
+        return "\n".join(
+            f"{name}: {value:.6f}" if isinstance(value, float) else f"{name}: {value}"
+            for name, value in self.as_dict().items()
+        )
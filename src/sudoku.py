@@ -3,26 +3,44 @@
 from __future__ import annotations
 
 import random
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Iterable, cast
 
 from src.pygame import pygame
-from src.solver import solve_space
+from src.solver import Config, solve_space
 from src.space import PlanarSpace, SpaceIndex
-from src.utils import await_key, flush_surface, setup_surface
+from src.sudoku_bits import peers
+from src.sudoku_rules import infer
+from src.utils import FramePacer, await_key, setup_surface
 
 if TYPE_CHECKING:
     from pathlib import Path
 
+    from src.stats import Stats
+
 COUNT = 9
 SUB = 3
 DRAW_SIZE = (500, 500)
 FILL_COLOR = (255, 255, 255)
 LINE_COLOR = (0, 0, 0)
 TEXT_COLOR = (0, 0, 0)
-FRAME_DELAY = 0.1
+FRAME_RATE = 10
 
 
 class Table(PlanarSpace):
+    rules: tuple[str, ...] = ()
+
+    def copy(self: Table) -> Table:
+        table = cast(Table, super().copy())
+        table.rules = self.rules
+        return table
+
+    def neighbors(self: Table, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        x, y = cast(tuple[int, int], index)
+        return peers(x, y)
+
+    def infer(self: Table) -> bool:
+        return infer(self, self.rules)
+
     def load(self: Table, text: str) -> None:
         for y, row in enumerate(text.split("\n")):
             for x, position in enumerate(row):
@@ -31,21 +49,8 @@ class Table(PlanarSpace):
 
     def propagate(self: Table, index: SpaceIndex) -> bool:
         x, y = cast(tuple[int, int], index)
-        state = self.get((x, y)).state
-        for xx in range(COUNT):
-            if xx != x and not self.remove((xx, y), [state]):
-                return False
-        for yy in range(COUNT):
-            if yy != y and not self.remove((x, yy), [state]):
-                return False
-        for xx in range(x // SUB * SUB, x // SUB * SUB + COUNT // SUB):
-            for yy in range(
-                y // SUB * SUB,
-                y // SUB * SUB + COUNT // SUB,
-            ):
-                if xx != x and yy != y and not self.remove((xx, yy), [state]):
-                    return False
-        return True
+        mask = self.get((x, y)).mask
+        return all(self.remove_mask(peer, mask) for peer in peers(x, y))
 
     def is_valid_cells(self: Table) -> bool:
         for y in range(COUNT):
@@ -154,27 +159,33 @@ class Table(PlanarSpace):
                                 )
 
 
-def draw_wait(table: Table, window: pygame.Surface, surface: pygame.Surface) -> None:
-    table.draw(surface)
-    flush_surface(window, surface)
-    await_key(seconds=FRAME_DELAY)
-
-
-def run(filename: Path | None) -> None:
+def run(
+    filename: Path | None,
+    stats: Stats | None = None,
+    config: Config | None = None,
+    *,
+    fps: float = FRAME_RATE,
+) -> None:
     random.seed(0)
     window, surface = setup_surface("Solve Sudoku", DRAW_SIZE)
     table = Table(count=COUNT, size=(COUNT, COUNT))
     if filename is not None:
         with filename.open() as f:
             table.load(f.read())
+    if config is not None:
+        table.rules = config.rules
+    table.start_trail()
+    pacer = FramePacer(window, surface, fps)
     solved = solve_space(
         table,
-        lambda t: draw_wait(cast(Table, t), window, surface),
+        lambda t: pacer.sample(cast(Table, t).draw),
+        stats,
+        config,
     )
     valid = table.is_valid
     pygame.display.set_caption(
         ("SOLVED" if valid and solved else "UNSOLVED" if valid else "INVALID")
         + " (ESC to exit)",
     )
-    draw_wait(table, window, surface)
+    pacer.show(table.draw)
     await_key()
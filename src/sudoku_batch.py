@@ -0,0 +1,218 @@
+# ruff: noqa: D100 D101 D102 D103 D105 D107
+
+from __future__ import annotations
+
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, TextIO
+
+from src.solver import Config, solve_space
+from src.stats import Stats
+from src.sudoku_mini import COUNT, Table
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+CHUNK_SIZE = 256
+PENDING_PER_WORKER = 4
+LINE_LENGTH = COUNT * COUNT
+EMPTY_CHARS = ".0"
+HISTOGRAM_BASE = 1.05
+
+Puzzle = tuple[str, bool]
+Result = tuple[str | None, float]
+
+
+def read_puzzles(lines: Iterable[str]) -> Iterator[Puzzle]:
+    """Yield puzzles as 9-line text, with a flag if read from one-line format.
+
+    Accepts both the 9-line format, rows with spaces for empty cells, and the
+    one-line format, 81 characters with '.' or '0' for empty cells. A single
+    blank line after a puzzle separates it from the next one. Any other blank
+    line is a row without given cells, as editors strip trailing spaces. Line
+    endings may be LF or CRLF.
+    """
+    rows: list[str] = []
+    ended = False
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if ended and not line:
+            ended = False
+            continue
+        ended = False
+        if len(line.strip()) == LINE_LENGTH:
+            line = line.strip()
+            for char in EMPTY_CHARS:
+                line = line.replace(char, " ")
+            yield (
+                "\n".join(line[i : i + COUNT] for i in range(0, LINE_LENGTH, COUNT)),
+                True,
+            )
+            ended = True
+            continue
+        rows.append(line)
+        if len(rows) == COUNT:
+            yield "\n".join(rows), False
+            rows = []
+            ended = True
+    if any(rows):
+        yield "\n".join(rows), False
+
+
+def format_solution(text: str, *, one_line: bool) -> str:
+    if one_line:
+        return text.replace("\n", "").replace(" ", ".") + "\n"
+    return text + "\n\n"
+
+
+def solve_puzzle(
+    text: str,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> Result:
+    start = time.perf_counter()
+    table = Table(count=COUNT, size=(COUNT, COUNT))
+    try:
+        table.load(text)
+    except (ValueError, IndexError):
+        return None, time.perf_counter() - start
+    if config is not None:
+        table.rules = config.rules
+    table.start_trail()
+    solved = solve_space(table, stats=stats, config=config)
+    return (str(table) if solved else None), time.perf_counter() - start
+
+
+def solve_chunk(
+    texts: list[str],
+    config: Config | None = None,
+    *,
+    collect: bool = False,
+) -> tuple[list[Result], Stats | None]:
+    stats = Stats() if collect else None
+    return [solve_puzzle(text, stats, config) for text in texts], stats
+
+
+class Histogram:
+    """Latency histogram with logarithmic buckets, using constant memory."""
+
+    counts: dict[int, int]
+    total: int
+
+    def __init__(self: Histogram) -> None:
+        self.counts = {}
+        self.total = 0
+
+    def add(self: Histogram, seconds: float) -> None:
+        bucket = int(math.log(max(seconds * 1e6, 1), HISTOGRAM_BASE))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+
+    def percentile(self: Histogram, fraction: float) -> float:
+        """Return the upper bound in seconds of the bucket at the given fraction."""
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= fraction * self.total:
+                return float(HISTOGRAM_BASE ** (bucket + 1) / 1e6)
+        return 0.0
+
+
+class Report:
+    solved: int
+    failed: int
+    latency: Histogram
+    start: float
+    stats: Stats | None
+
+    def __init__(self: Report, stats: Stats | None = None) -> None:
+        self.solved = 0
+        self.failed = 0
+        self.latency = Histogram()
+        self.start = time.perf_counter()
+        self.stats = stats
+
+    def add(self: Report, result: Result) -> None:
+        if result[0] is None:
+            self.failed += 1
+        else:
+            self.solved += 1
+        self.latency.add(result[1])
+
+    def __str__(self: Report) -> str:
+        elapsed = time.perf_counter() - self.start
+        total = self.solved + self.failed
+        return (
+            f"puzzles: {total}, solved: {self.solved}, failed: {self.failed}\n"
+            f"elapsed: {elapsed:.3f}s, {total / elapsed if elapsed else 0:.1f}"
+            " puzzles/sec\n"
+            f"latency p50: {self.latency.percentile(0.5) * 1e3:.3f}ms,"
+            f" p99: {self.latency.percentile(0.99) * 1e3:.3f}ms"
+        )
+
+
+def write_chunk(
+    out: TextIO,
+    report: Report,
+    puzzles: list[Puzzle],
+    future: Future[tuple[list[Result], Stats | None]],
+) -> None:
+    results, stats = future.result()
+    if report.stats is not None and stats is not None:
+        report.stats.merge(stats)
+    for (text, one_line), result in zip(puzzles, results):
+        report.add(result)
+        out.write(format_solution(result[0] or text, one_line=one_line))
+
+
+def solve_stream(
+    lines: Iterable[str],
+    out: TextIO,
+    workers: int | None = None,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> Report:
+    """Solve all puzzles in the input, writing solutions in input order.
+
+    Puzzles are read and submitted in chunks, with a bounded number of chunks
+    in flight, so memory does not depend on the input size. Unsolved puzzles are
+    written unchanged. Stats of all workers are merged into the given stats.
+    """
+    report = Report(stats)
+    puzzles = read_puzzles(lines)
+    workers = workers or os.cpu_count() or 1
+    limit = PENDING_PER_WORKER * workers
+    with ProcessPoolExecutor(workers) as executor:
+        pending: deque[
+            tuple[list[Puzzle], Future[tuple[list[Result], Stats | None]]]
+        ] = deque()
+        while chunk := list(islice(puzzles, CHUNK_SIZE)):
+            if len(pending) >= limit:
+                done, future = pending.popleft()
+                write_chunk(out, report, done, future)
+            texts = [text for text, _ in chunk]
+            future = executor.submit(solve_chunk, texts, config, collect=bool(stats))
+            pending.append((chunk, future))
+        while pending:
+            done, future = pending.popleft()
+            write_chunk(out, report, done, future)
+    return report
+
+
+def run(
+    filename: Path,
+    stats: Stats | None = None,
+    config: Config | None = None,
+) -> None:
+    if str(filename) == "-":
+        report = solve_stream(sys.stdin, sys.stdout, stats=stats, config=config)
+    else:
+        with filename.open() as f:
+            report = solve_stream(f, sys.stdout, stats=stats, config=config)
+    sys.stdout.flush()
+    sys.stderr.write(f"{report}\n")
@@ -0,0 +1,178 @@
+# ruff: noqa: D100 D101 D102 D103 D105 D107
+
+from __future__ import annotations
+
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from src.stats import Stats
+
+COUNT = 9
+SUB = 3
+CELLS = COUNT * COUNT
+FULL = (1 << COUNT) - 1
+
+ROW = [cell // COUNT for cell in range(CELLS)]
+COL = [cell % COUNT for cell in range(CELLS)]
+BOX = [ROW[cell] // SUB * SUB + COL[cell] // SUB for cell in range(CELLS)]
+UNITS = [
+    tuple(cell for cell in range(CELLS) if unit[cell] == index)
+    for unit in (ROW, COL, BOX)
+    for index in range(COUNT)
+]
+PEERS = [
+    tuple(
+        (other % COUNT, other // COUNT)
+        for other in range(CELLS)
+        if other != cell
+        and (
+            ROW[other] == ROW[cell]
+            or COL[other] == COL[cell]
+            or BOX[other] == BOX[cell]
+        )
+    )
+    for cell in range(CELLS)
+]
+
+
+def peers(x: int, y: int) -> tuple[tuple[int, int], ...]:
+    return PEERS[y * COUNT + x]
+
+
+class Board:
+    """Sudoku solver keeping used digits per row, column and box as bitmasks.
+
+    The candidates of a cell are the digits not used in any of its units, so
+    placing a digit eliminates it from all 20 peers with three bit operations.
+    """
+
+    digits: list[int]
+    rows: list[int]
+    cols: list[int]
+    boxes: list[int]
+    valid: bool
+    stats: Stats | None = None
+
+    def __init__(self: Board) -> None:
+        self.digits = [-1] * CELLS
+        self.rows = [0] * COUNT
+        self.cols = [0] * COUNT
+        self.boxes = [0] * COUNT
+        self.valid = True
+
+    def load(self: Board, text: str) -> None:
+        for y, row in enumerate(text.split("\n")):
+            for x, position in enumerate(row):
+                if position != " ":
+                    cell = y * COUNT + x
+                    digit = int(position) - 1
+                    if not self.candidates(cell) >> digit & 1:
+                        self.valid = False
+                    self.place(cell, digit)
+
+    def candidates(self: Board, cell: int) -> int:
+        return FULL & ~(
+            self.rows[ROW[cell]] | self.cols[COL[cell]] | self.boxes[BOX[cell]]
+        )
+
+    def place(self: Board, cell: int, digit: int) -> None:
+        bit = 1 << digit
+        self.digits[cell] = digit
+        self.rows[ROW[cell]] |= bit
+        self.cols[COL[cell]] |= bit
+        self.boxes[BOX[cell]] |= bit
+
+    def unplace(self: Board, cell: int) -> None:
+        bit = ~(1 << self.digits[cell])
+        self.digits[cell] = -1
+        self.rows[ROW[cell]] &= bit
+        self.cols[COL[cell]] &= bit
+        self.boxes[BOX[cell]] &= bit
+
+    def select(self: Board) -> tuple[int, int]:
+        """Return the empty cell with fewest candidates and its candidates.
+
+        A digit that fits only one cell of a unit (hidden single) is returned as
+        the only candidate of that cell. Returns cell -1 if the board is full,
+        and candidates 0 on a conflict.
+        """
+        masks = [0] * CELLS
+        best, best_mask, best_count = -1, 0, COUNT + 1
+        for cell in range(CELLS):
+            if self.digits[cell] >= 0:
+                continue
+            mask = self.candidates(cell)
+            masks[cell] = mask
+            count = mask.bit_count()
+            if count < best_count:
+                best, best_mask, best_count = cell, mask, count
+                if count == 0:
+                    return best, best_mask
+        if best_count <= 1:
+            return best, best_mask
+        return self.hidden_single(masks) or (best, best_mask)
+
+    def hidden_single(self: Board, masks: list[int]) -> tuple[int, int] | None:
+        """Return a cell and digit bit that is the only fit in one of its units.
+
+        Returns candidates 0 if a unit has a digit that fits nowhere.
+        """
+        for unit in UNITS:
+            once, twice, placed = 0, 0, 0
+            for cell in unit:
+                if self.digits[cell] >= 0:
+                    placed |= 1 << self.digits[cell]
+                mask = masks[cell]
+                twice |= once & mask
+                once |= mask
+            if once | placed != FULL:
+                return unit[0], 0
+            single = once & ~twice
+            if single:
+                bit = single & -single
+                for cell in unit:
+                    if masks[cell] & bit:
+                        return cell, bit
+        return None
+
+    def solve(self: Board) -> bool:
+        if not self.valid:
+            return False
+        if self.stats is not None:
+            self.stats.nodes += 1
+        cell, mask = self.select()
+        if cell < 0:
+            return True
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            self.place(cell, bit.bit_length() - 1)
+            if self.solve():
+                return True
+            self.unplace(cell)
+        if self.stats is not None:
+            self.stats.backtracks += 1
+        return False
+
+    def __str__(self: Board) -> str:
+        return "\n".join(
+            "".join(
+                str(self.digits[y * COUNT + x] + 1)
+                if self.digits[y * COUNT + x] >= 0
+                else " "
+                for x in range(COUNT)
+            )
+            for y in range(COUNT)
+        )
+
+
+def run(filename: Path, stats: Stats | None = None) -> None:
+    board = Board()
+    board.stats = stats
+    with filename.open() as f:
+        board.load(f.read())
+    solved = board.solve()
+    sys.stderr.write(f"{'SOLVED' if solved else 'UNSOLVED'}\n{board}\n")
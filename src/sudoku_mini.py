@@ -3,19 +3,38 @@
 from __future__ import annotations
 
 import sys
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Iterable, cast
 
-from src.solver import solve_space
+from src.model import Model, ModelSpace
+from src.solver import Config, count_solutions, iter_solutions, solve_space
 from src.space import PlanarSpace, SpaceIndex
+from src.sudoku_bits import UNITS, peers
+from src.sudoku_rules import infer
 
 if TYPE_CHECKING:
     from pathlib import Path
 
+    from src.stats import Stats
+
 COUNT = 9
 SUB = 3
 
 
 class Table(PlanarSpace):
+    rules: tuple[str, ...] = ()
+
+    def copy(self: Table) -> Table:
+        table = cast(Table, super().copy())
+        table.rules = self.rules
+        return table
+
+    def neighbors(self: Table, index: SpaceIndex) -> Iterable[SpaceIndex]:
+        x, y = cast(tuple[int, int], index)
+        return peers(x, y)
+
+    def infer(self: Table) -> bool:
+        return infer(self, self.rules)
+
     def load(self: Table, text: str) -> None:
         for y, row in enumerate(text.split("\n")):
             for x, position in enumerate(row):
@@ -24,21 +43,8 @@ class Table(PlanarSpace):
 
     def propagate(self: Table, index: SpaceIndex) -> bool:
         x, y = cast(tuple[int, int], index)
-        state = self.get((x, y)).state
-        for xx in range(COUNT):
-            if xx != x and not self.remove((xx, y), [state]):
-                return False
-        for yy in range(COUNT):
-            if yy != y and not self.remove((x, yy), [state]):
-                return False
-        for xx in range(x // SUB * SUB, x // SUB * SUB + COUNT // SUB):
-            for yy in range(
-                y // SUB * SUB,
-                y // SUB * SUB + COUNT // SUB,
-            ):
-                if xx != x and yy != y and not self.remove((xx, yy), [state]):
-                    return False
-        return True
+        mask = self.get((x, y)).mask
+        return all(self.remove_mask(peer, mask) for peer in peers(x, y))
 
     def __str__(self: Table) -> str:
         return "\n".join(
@@ -47,9 +53,46 @@ class Table(PlanarSpace):
         )
 
 
-def run(filename: Path) -> None:
-    table = Table(count=COUNT, size=(COUNT, COUNT))
+class ModelTable(ModelSpace, Table):
+    def copy(self: ModelTable) -> ModelTable:
+        return cast(ModelTable, super().copy())
+
+
+def create_model() -> Model:
+    model = Model(COUNT)
+    for unit in UNITS:
+        model.all_different((cell % COUNT, cell // COUNT) for cell in unit)
+    return model
+
+
+def create_table(*, model: bool = False) -> Table:
+    if not model:
+        return Table(count=COUNT, size=(COUNT, COUNT))
+    table = ModelTable(count=COUNT, size=(COUNT, COUNT))
+    table.use_model(create_model())
+    return table
+
+
+def run(  # noqa: PLR0913
+    filename: Path,
+    stats: Stats | None = None,
+    config: Config | None = None,
+    *,
+    count: bool = False,
+    limit: int | None = None,
+    model: bool = False,
+) -> None:
+    table = create_table(model=model)
     with filename.open() as f:
         table.load(f.read())
-    solved = solve_space(table)
-    sys.stderr.write(f"{'SOLVED' if solved else 'UNSOLVED'}\n{table}\n")
+    if config is not None:
+        table.rules = config.rules
+    table.start_trail()
+    if count:
+        sys.stderr.write(f"solutions: {count_solutions(table, limit, stats, config)}\n")
+    elif limit is not None:
+        for solution in iter_solutions(table, limit, stats, config):
+            sys.stderr.write(f"{solution}\n\n")
+    else:
+        solved = solve_space(table, stats=stats, config=config)
+        sys.stderr.write(f"{'SOLVED' if solved else 'UNSOLVED'}\n{table}\n")
@@ -0,0 +1,234 @@
+# ruff: noqa: D100 D101 D102 D103 D105 D107
+
+from __future__ import annotations
+
+from functools import reduce
+from itertools import combinations
+from operator import or_
+from typing import TYPE_CHECKING, Callable
+
+from src.sudoku_bits import BOX, COL, COUNT, FULL, ROW, UNITS
+
+if TYPE_CHECKING:
+    from src.space import PlanarSpace
+
+CONFLICT = -1
+
+Index = tuple[int, int]
+Rule = Callable[["PlanarSpace"], int]
+
+UNIT_INDICES = [tuple((cell % COUNT, cell // COUNT) for cell in unit) for unit in UNITS]
+ROW_UNITS = UNIT_INDICES[:COUNT]
+COL_UNITS = UNIT_INDICES[COUNT : 2 * COUNT]
+BOX_UNITS = UNIT_INDICES[2 * COUNT :]
+
+
+def box_of(index: Index) -> int:
+    return BOX[index[1] * COUNT + index[0]]
+
+
+def line_of(index: Index, unit: int) -> int:
+    cell = index[1] * COUNT + index[0]
+    return ROW[cell] if unit < COUNT else COL[cell]
+
+
+def eliminate(table: PlanarSpace, indices: list[Index], mask: int) -> int:
+    """Remove the mask from all indices, returning the number of states removed."""
+    count = 0
+    for index in indices:
+        hit = table.get(index).mask & mask
+        if hit:
+            if not table.remove_mask(index, hit):
+                return CONFLICT
+            count += hit.bit_count()
+    return count
+
+
+def hidden_singles(table: PlanarSpace) -> int:
+    """Solve cells that are the only place for a digit in one of their units."""
+    count = 0
+    for unit in UNIT_INDICES:
+        positions = [table.get(index) for index in unit]
+        once, twice = 0, 0
+        for position in positions:
+            twice |= once & position.mask
+            once |= position.mask
+        if once != FULL:
+            return CONFLICT
+        single = once & ~twice
+        for index, position in zip(unit, positions):
+            bit = position.mask & single
+            if bit and not position.is_solved:
+                if bit & (bit - 1) or not table.solve(index, bit.bit_length() - 1):
+                    return CONFLICT
+                count += 1
+    return count
+
+
+def naked_subsets(table: PlanarSpace, size: int) -> int:
+    """Remove digits of size cells with only size digits from the rest of a unit."""
+    count = 0
+    for unit in UNIT_INDICES:
+        candidates = [
+            (index, table.get(index).mask)
+            for index in unit
+            if 1 < table.get(index).count <= size
+        ]
+        for subset in combinations(candidates, size):
+            mask = reduce(or_, (mask for _, mask in subset))
+            digits = mask.bit_count()
+            if digits < size:
+                return CONFLICT
+            if digits > size:
+                continue
+            inside = {index for index, _ in subset}
+            removed = eliminate(
+                table,
+                [index for index in unit if index not in inside],
+                mask,
+            )
+            if removed == CONFLICT:
+                return CONFLICT
+            count += removed
+    return count
+
+
+def hidden_subsets(table: PlanarSpace, size: int) -> int:
+    """Remove other digits from size cells that hold the only places of size digits."""
+    count = 0
+    for unit in UNIT_INDICES:
+        positions = [table.get(index) for index in unit]
+        places = []
+        for digit in range(COUNT):
+            bit = 1 << digit
+            cells = 0
+            for i, position in enumerate(positions):
+                if position.mask & bit:
+                    if position.is_solved:
+                        break
+                    cells |= 1 << i
+            else:
+                if 1 < cells.bit_count() <= size:
+                    places.append((bit, cells))
+        for subset in combinations(places, size):
+            cells = reduce(or_, (cells for _, cells in subset))
+            if cells.bit_count() != size:
+                continue
+            keep = reduce(or_, (bit for bit, _ in subset))
+            removed = eliminate(
+                table,
+                [index for i, index in enumerate(unit) if cells >> i & 1],
+                FULL & ~keep,
+            )
+            if removed == CONFLICT:
+                return CONFLICT
+            count += removed
+    return count
+
+
+def digit_cells(table: PlanarSpace, unit: tuple[Index, ...], bit: int) -> list[Index]:
+    """Return the unsolved cells of a unit with the digit, empty if it is placed."""
+    cells = []
+    for index in unit:
+        position = table.get(index)
+        if position.mask & bit:
+            if position.is_solved:
+                return []
+            cells.append(index)
+    return cells
+
+
+def pointing(table: PlanarSpace) -> int:
+    """Remove digits confined to one line of a box from the rest of that line.
+
+    Conversely, remove digits confined to one box of a line from the rest of
+    that box (box-line reduction).
+    """
+    count = 0
+    lines = ROW_UNITS + COL_UNITS
+    for digit in range(COUNT):
+        bit = 1 << digit
+        for box, unit in enumerate(BOX_UNITS):
+            cells = digit_cells(table, unit, bit)
+            if not cells:
+                continue
+            for offset in (0, COUNT):
+                line = {line_of(index, offset) for index in cells}
+                if len(line) == 1:
+                    removed = eliminate(
+                        table,
+                        [
+                            index
+                            for index in lines[offset + line.pop()]
+                            if box_of(index) != box
+                        ],
+                        bit,
+                    )
+                    if removed == CONFLICT:
+                        return CONFLICT
+                    count += removed
+        for number, unit in enumerate(lines):
+            cells = digit_cells(table, unit, bit)
+            boxes = {box_of(index) for index in cells}
+            if len(boxes) == 1:
+                removed = eliminate(
+                    table,
+                    [
+                        index
+                        for index in BOX_UNITS[boxes.pop()]
+                        if line_of(index, number) != number % COUNT
+                    ],
+                    bit,
+                )
+                if removed == CONFLICT:
+                    return CONFLICT
+                count += removed
+    return count
+
+
+def naked_pairs(table: PlanarSpace) -> int:
+    return naked_subsets(table, 2)
+
+
+def hidden_pairs(table: PlanarSpace) -> int:
+    return hidden_subsets(table, 2)
+
+
+def naked_triples(table: PlanarSpace) -> int:
+    return naked_subsets(table, 3)
+
+
+def hidden_triples(table: PlanarSpace) -> int:
+    return hidden_subsets(table, 3)
+
+
+RULES: dict[str, Rule] = {
+    "hidden_singles": hidden_singles,
+    "naked_pairs": naked_pairs,
+    "hidden_pairs": hidden_pairs,
+    "pointing": pointing,
+    "naked_triples": naked_triples,
+    "hidden_triples": hidden_triples,
+}
+
+
+def infer(table: PlanarSpace, names: tuple[str, ...]) -> bool:
+    """Apply the named rules in order, until none applies or the queue fills.
+
+    After a rule removed states, the rules start over from the first, so
+    cheap rules run most. A rule that solves a cell hands back to the queue.
+    Changes are attributed to all decisions made so far.
+    """
+    i = 0
+    while i < len(names):
+        if table.reasons is not None:
+            table.cause = reduce(or_, table.reasons.values(), 0)
+        count = RULES[names[i]](table)
+        if count == CONFLICT:
+            return False
+        if count and table.stats is not None:
+            table.stats.rules[names[i]] = table.stats.rules.get(names[i], 0) + count
+        if table.queue:
+            return True
+        i = 0 if count else i + 1
+    return True
@@ -0,0 +1,77 @@
+"""Zobrist hashing of spaces, and a table of spaces known to have no solution.
+
+The hash of a space is the XOR of a random 64-bit key for every state still
+present in every position. Removing a state flips its key, so the hash is
+updated in constant time per removed state. Spaces with equal states have equal
+hashes, however they were reached.
+"""
+
+from __future__ import annotations
+
+import random
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.space import SpaceIndex
+
+KEY_BITS = 64
+
+
+class Zobrist:
+    """Random keys per position and state, created on first use."""
+
+    keys: dict[SpaceIndex, list[int]]
+    random: random.Random
+
+    def __init__(self: Zobrist, seed: int = 0) -> None:
+        """Create keys from their own random generator, leaving the global one."""
+        self.keys = {}
+        self.random = random.Random(seed)
+
+    def delta(self: Zobrist, index: SpaceIndex, mask: int) -> int:
+        """Return the XOR of the keys of all states set in the mask."""
+        keys = self.keys.get(index)
+        if keys is None:
+            keys = self.keys[index] = []
+        while len(keys) < mask.bit_length():
+            keys.append(self.random.getrandbits(KEY_BITS))
+        result = 0
+        while mask:
+            bit = mask & -mask
+            result ^= keys[bit.bit_length() - 1]
+            mask ^= bit
+        return result
+
+
+class TranspositionTable:
+    """Bounded set of hashes of spaces without a solution.
+
+    When full, the least recently used hash is evicted.
+    """
+
+    limit: int
+    entries: OrderedDict[int, None]
+
+    def __init__(self: TranspositionTable, limit: int) -> None:
+        """Create an empty table holding up to limit hashes."""
+        self.limit = limit
+        self.entries = OrderedDict()
+
+    def add(self: TranspositionTable, key: int) -> None:
+        """Add the hash of a space without a solution."""
+        self.entries[key] = None
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+
+    def known(self: TranspositionTable, key: int) -> bool:
+        """Return True if the hash is known, marking it as recently used."""
+        if key not in self.entries:
+            return False
+        self.entries.move_to_end(key)
+        return True
+
+    def __len__(self: TranspositionTable) -> int:
+        """Return the number of hashes in the table."""
+        return len(self.entries)
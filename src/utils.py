@@ -1,9 +1,14 @@
-# ruff: noqa: D100 D101 D102 D103 D105 D107
+"""Windows, key handling and frame pacing shared by the animated scripts.
+
+Scripts draw on a surface of their own size, which is scaled into the window.
+Escape or closing the window quits, space continues to the next step.
+"""
 
 from __future__ import annotations
 
 import sys
 import time
+from typing import Callable
 
 from src.pygame import pygame
 
@@ -16,6 +21,7 @@ def setup_surface(
     size: tuple[int, int],
     scale: float = 1,
 ) -> tuple[pygame.Surface, pygame.Surface]:
+    """Open a window of size divided by scale, returning it and a surface of size."""
     pygame.init()
     pygame.display.set_caption(title)
     window = pygame.display.set_mode((size[0] / scale, size[1] / scale))
@@ -24,6 +30,11 @@ def setup_surface(
 
 
 def flush_surface(window: pygame.Surface, surface: pygame.Surface) -> None:
+    """Scale the surface into the window and show it.
+
+    If the last command line argument is `record`, the raw window pixels are
+    also written to stdout, one frame per call.
+    """
     window_size = window.get_rect().size
     if surface.get_rect().size[0] > window_size[0]:
         window.blit(pygame.transform.smoothscale(surface, window_size), (0, 0))
@@ -34,17 +45,70 @@ def flush_surface(window: pygame.Surface, surface: pygame.Surface) -> None:
     pygame.display.update()
 
 
+def handle_event(event: pygame.event.Event) -> bool:
+    """Exit on quit or the exit key, returning True on the next key."""
+    if event.type == pygame.QUIT or (
+        event.type == pygame.KEYDOWN and event.key == EXIT_KEY
+    ):
+        pygame.quit()
+        sys.exit()
+    return event.type == pygame.KEYDOWN and event.key == NEXT_KEY
+
+
 def await_key(seconds: float | None = None) -> None:
-    t = time.time()
+    """Block on events until the next key, or until seconds have passed."""
+    deadline = None if seconds is None else time.monotonic() + seconds
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT or (
-                event.type == pygame.KEYDOWN and event.key == EXIT_KEY
-            ):
-                pygame.quit()
-                sys.exit()
+        if deadline is None:
+            event = pygame.event.wait()
+        else:
+            remaining = round((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
                 return
-            if event.type == pygame.KEYDOWN and event.key == NEXT_KEY:
+            event = pygame.event.wait(remaining)
+            if event.type == pygame.NOEVENT:
                 return
-        if seconds is not None and time.time() - t > seconds:
+        if handle_event(event):
             return
+
+
+class FramePacer:
+    """Show frames at a target rate while the solver runs at full speed.
+
+    The solver calls back on every node, a snapshot is only drawn once a frame
+    is due. Events are handled with every frame, without waiting.
+    """
+
+    window: pygame.Surface
+    surface: pygame.Surface
+    period: float
+    next_frame: float
+
+    def __init__(
+        self: FramePacer,
+        window: pygame.Surface,
+        surface: pygame.Surface,
+        fps: float,
+    ) -> None:
+        """Create a pacer drawing into surface, shown in window at fps."""
+        self.window = window
+        self.surface = surface
+        self.period = 1 / fps
+        self.next_frame = 0.0
+
+    def due(self: FramePacer) -> bool:
+        """Return True if the next frame should be shown."""
+        return time.monotonic() >= self.next_frame
+
+    def show(self: FramePacer, draw: Callable[[pygame.Surface], None]) -> None:
+        """Draw and show a frame now, handling pending events."""
+        draw(self.surface)
+        flush_surface(self.window, self.surface)
+        for event in pygame.event.get():
+            handle_event(event)
+        self.next_frame = time.monotonic() + self.period
+
+    def sample(self: FramePacer, draw: Callable[[pygame.Surface], None]) -> None:
+        """Draw and show a frame if one is due, otherwise return right away."""
+        if self.due():
+            self.show(draw)
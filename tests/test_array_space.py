@@ -0,0 +1,69 @@
+"""Array spaces must behave like the spaces they replace."""
+
+from __future__ import annotations
+
+import pickle
+import random
+
+import pytest
+
+from src import automata, loops
+from src.array_space import ArrayPlanarSpace
+from src.solver import solve_space
+from src.space import PlanarSpace
+
+
+def solved_pair(name: str) -> tuple[PlanarSpace, ArrayPlanarSpace]:
+    """Return a plain and an array scene solved with the same seed."""
+    scenes = []
+    for array in (False, True):
+        random.seed(0)
+        scene = (
+            loops.create_scene(12, array=array)
+            if name == "loops"
+            else automata.create_scene((12, 12), array=array)
+        )
+        scene.start_trail()
+        assert solve_space(scene)
+        scenes.append(scene)
+    plain, array_scene = scenes
+    assert isinstance(array_scene, ArrayPlanarSpace)
+    return plain, array_scene
+
+
+@pytest.mark.parametrize("name", ["loops", "automata"])
+def test_same_solution(name: str) -> None:
+    plain, array = solved_pair(name)
+    assert str(array) == str(plain)
+    assert array.dump() == plain.dump()
+    assert array.is_complete
+
+
+def test_loops_is_valid() -> None:
+    plain, array = solved_pair("loops")
+    assert array.is_valid
+    position = array.get((3, 4))
+    position.restore(1 << (position.state + 1) % loops.STATE_COUNT)
+    plain.get((3, 4)).restore(position.mask)
+    assert not array.is_valid
+    assert not plain.is_valid
+    position.restore(0b11)
+    assert not array.is_valid
+
+
+def test_views_are_kept() -> None:
+    _, array = solved_pair("automata")
+    assert array.get((2, 3)) is array.matrix[3][2]
+    copy = array.copy()
+    copy.get((2, 3)).restore(0b11)
+    assert array.get((2, 3)).is_solved
+    array.assign(copy)
+    assert not array.get((2, 3)).is_solved
+
+
+def test_pickle_without_views() -> None:
+    _, array = solved_pair("automata")
+    array.trail = None
+    restored = pickle.loads(pickle.dumps(array))
+    assert restored.views is None
+    assert restored.dump() == array.dump()
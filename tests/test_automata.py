@@ -0,0 +1,117 @@
+"""Compiled automata rules must agree with the rows of the rule."""
+
+from __future__ import annotations
+
+from itertools import product
+
+import pytest
+
+from src import automata
+from src.automata import INVALID, UNKNOWN, UNSOLVED, compile_rule, rule_rows
+
+CELLS = len(automata.rule_offset)
+CODES = list(product(range(1 << automata.CODE_BITS), repeat=CELLS))
+
+
+def expected_actions(rule: int, codes: tuple[int, ...]) -> automata.Actions | None:
+    """Return the actions of a window, from the rows that match its known cells."""
+    matching = [
+        row
+        for row in rule_rows(rule)
+        if all(code in (UNKNOWN, part) for code, part in zip(codes, row))
+    ]
+    if not matching:
+        return None
+    actions = []
+    for i, code in enumerate(codes):
+        if code == UNKNOWN:
+            parts = {row[i] for row in matching}
+            actions.append((i, parts.pop() if len(parts) == 1 else UNSOLVED))
+    return tuple(actions)
+
+
+@pytest.mark.parametrize("rule", range(automata.RULE_COUNT))
+def test_compile_rule(rule: int) -> None:
+    lookup = compile_rule(rule)
+    assert len(lookup) == len(CODES)
+    for key, codes in enumerate(CODES):
+        assert lookup[key] == expected_actions(rule, codes), codes
+
+
+@pytest.mark.parametrize("rule", [0, 30, 90, 110, 255])
+def test_compile_rule_known(rule: int) -> None:
+    lookup = compile_rule(rule)
+    for left, center, right, below in product((0, 1), repeat=CELLS):
+        key = left << 6 | center << 4 | right << 2 | below
+        allowed = rule >> (left << 2 | center << 1 | right) & 1 == below
+        assert lookup[key] == (() if allowed else None)
+
+
+def test_compile_rule_invalid() -> None:
+    lookup = compile_rule(automata.RULE)
+    for codes in CODES:
+        key = 0
+        for code in codes:
+            key = key << automata.CODE_BITS | code
+        if INVALID in codes:
+            assert lookup[key] is None
+
+
+def test_window_key() -> None:
+    scene = automata.create_scene((3, 3))
+    scene.solve((0, 0), 1)
+    scene.solve((1, 0), 0)
+    scene.solve((2, 0), 2)
+    window = tuple(automata.rule_offset)
+    assert scene.window_key(1, 1, window) == 1 << 6 | 0 << 4 | INVALID << 2 | UNKNOWN
+    assert scene.window_key(0, 1, window) == (
+        UNKNOWN << 6 | 1 << 4 | 0 << 2 | UNKNOWN
+    )
+    assert scene.window_key(1, 0, window) == (
+        UNKNOWN << 6 | UNKNOWN << 4 | UNKNOWN << 2 | 0
+    )
+
+
+def test_marker_state_conflicts() -> None:
+    scene = automata.create_scene((3, 3))
+    scene.start_trail()
+    assert scene.solve((1, 1), 4)
+    assert not scene.propagate((1, 1))
+
+
+def follows_rule(rows: list[str], rule: int) -> bool:
+    """Return True if every inner cell below the first row follows the rule."""
+    for above, row in zip(rows, rows[1:]):
+        for x in range(1, len(row) - 1):
+            left, center, right = (int(cell) for cell in above[x - 1 : x + 2])
+            if rule >> (left << 2 | center << 1 | right) & 1 != int(row[x]):
+                return False
+    return True
+
+
+@pytest.mark.parametrize(
+    ("window", "model", "rule"),
+    [(6, False, 30), (1, False, 30), (40, False, 30), (6, True, 30), (6, False, 90)],
+)
+def test_run_window(
+    capsys: pytest.CaptureFixture[str],
+    window: int,
+    *,
+    model: bool,
+    rule: int,
+) -> None:
+    automata.run_window(width=12, rows=20, window=window, model=model, rule=rule)
+    out, err = capsys.readouterr()
+    assert err == "SOLVED\n"
+    rows = out.split()
+    assert len(rows) == 20
+    assert all(len(row) == 12 and set(row) <= {"0", "1"} for row in rows)
+    assert follows_rule(rows, rule)
+
+
+def test_run_window_deterministic(capsys: pytest.CaptureFixture[str]) -> None:
+    outputs = []
+    for _ in range(2):
+        automata.run_window(width=12, rows=20, window=6, seed=3)
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,68 @@
+"""Tiled loops planes must round-trip through their binary stream."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from src import loops
+
+SIZE = 10
+TILE = 4
+
+
+def assemble(stream: io.BytesIO) -> dict[tuple[int, int], list[list[int]]]:
+    """Read all tiles of a stream, keyed by tile column and row."""
+    tiles = {}
+    for i, j, cells in loops.read_tiles(stream):
+        assert (i, j) not in tiles
+        tiles[i, j] = cells
+    return tiles
+
+
+@pytest.mark.parametrize("count", [0, 1, 3, 4, 5, 8, 13])
+def test_pack_round_trip(count: int) -> None:
+    cells = [(i * 7 + 3) % loops.STATE_COUNT for i in range(count)]
+    data = loops.pack_cells(cells)
+    assert len(data) == -(-count // loops.CELLS_PER_BYTE)
+    assert loops.unpack_cells(data, count) == cells
+
+
+def test_pack_layout() -> None:
+    assert loops.pack_cells([1, 2, 3, 0, 3]) == bytes([0b00111001, 0b11])
+
+
+def test_read_tiles() -> None:
+    stream = io.BytesIO()
+    stream.write(loops.TILED_HEADER.pack(loops.TILED_MAGIC, 3, 2, 2))
+    for i, j, cells in ((1, 0, [3, 2]), (0, 0, [0, 1, 2, 3])):
+        stream.write(loops.TILE_HEADER.pack(i, j))
+        stream.write(loops.pack_cells(cells))
+    stream.seek(0)
+    assert list(loops.read_tiles(stream)) == [
+        (1, 0, [[3], [2]]),
+        (0, 0, [[0, 1], [2, 3]]),
+    ]
+
+
+def test_read_tiles_magic() -> None:
+    stream = io.BytesIO(loops.TILED_HEADER.pack(b"POOL", 1, 1, 1))
+    with pytest.raises(ValueError):
+        list(loops.read_tiles(stream))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_tiled(capsysbinary: pytest.CaptureFixture[bytes], workers: int) -> None:
+    loops.run_tiled(size=SIZE, tile=TILE, workers=workers, seed=1)
+    out, err = capsysbinary.readouterr()
+    assert err == b"SOLVED\n"
+    tiles = assemble(io.BytesIO(out))
+    count = -(-SIZE // TILE)
+    assert set(tiles) == {(i, j) for i in range(count) for j in range(count)}
+    scene = loops.create_rect_scene((SIZE, SIZE))
+    for (i, j), cells in tiles.items():
+        for y, row in enumerate(cells):
+            for x, state in enumerate(row):
+                scene.matrix[j * TILE + y][i * TILE + x].solve(state)
+    assert scene.is_valid
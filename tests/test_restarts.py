@@ -0,0 +1,74 @@
+"""Restarts must follow their schedule and still find the solution."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+
+from src import loops, sudoku_mini
+from src.solver import Config, Restarts, count_solutions, luby, solve_space
+from src.space import Space
+from src.stats import Stats
+
+SUDOKU = Path(__file__).parent.parent / "data" / "sudoku" / "expert.txt"
+LUBY = (1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, 1, 1, 2, 1, 1, 2, 4, 1, 1, 2)
+
+
+def sudoku_table() -> Space:
+    """Return the expert sudoku, ready to solve."""
+    table = sudoku_mini.create_table()
+    table.load(SUDOKU.read_text())
+    table.start_trail()
+    return table
+
+
+def test_luby() -> None:
+    assert tuple(luby(i) for i in range(1, len(LUBY) + 1)) == LUBY
+
+
+def test_luby_powers() -> None:
+    for size in range(1, 20):
+        assert luby((1 << size) - 1) == 1 << (size - 1)
+
+
+def test_cutoff_luby() -> None:
+    restarts = Restarts(10)
+    assert [restarts.cutoff(i) for i in range(1, 8)] == [10, 10, 20, 10, 10, 20, 40]
+
+
+def test_cutoff_geometric() -> None:
+    restarts = Restarts(10, "geometric", 1.5)
+    assert [restarts.cutoff(i) for i in range(1, 6)] == [10, 15, 22, 33, 50]
+
+
+@pytest.mark.parametrize(
+    ("schedule", "unit"),
+    [("fibonacci", "backtracks"), ("luby", "seconds")],
+)
+def test_invalid(schedule: str, unit: str) -> None:
+    with pytest.raises(ValueError):
+        Restarts(schedule=schedule, unit=unit)
+
+
+@pytest.mark.parametrize("unit", Restarts.UNITS)
+@pytest.mark.parametrize("schedule", Restarts.SCHEDULES)
+def test_solve_with_restarts(schedule: str, unit: str) -> None:
+    random.seed(0)
+    expected = sudoku_table()
+    assert solve_space(expected)
+    random.seed(0)
+    table = sudoku_table()
+    stats = Stats()
+    config = Config(Restarts(1, schedule, 2, unit))
+    assert solve_space(table, stats=stats, config=config)
+    assert stats.restarts > 0
+    assert str(table) == str(expected)
+
+
+def test_count_ignores_restarts() -> None:
+    random.seed(0)
+    scene = loops.create_scene(4)
+    scene.start_trail()
+    assert count_solutions(scene, config=Config(Restarts(1))) == 256
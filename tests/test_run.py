@@ -0,0 +1,63 @@
+"""Options that do not apply to a script must be rejected."""
+
+from __future__ import annotations
+
+import shlex
+
+import pytest
+
+import run
+
+ACCEPTED = [
+    "sudoku_mini data/sudoku/hard.txt --count --solutions 2 --model",
+    "sudoku_batch puzzles.txt --rules all --backjump",
+    "loops --headless --size 10 --flat --binary",
+    "loops --size 100 --tile 10 --workers 2",
+    "loops --count --size 4 --parallel 2",
+    "automata --size 20 --rows 100 --window 8 --rule 110",
+    "automata --sweep --size 10 --workers 2",
+    "automata --headless --array --portfolio 2",
+    "loops --fps 30",
+]
+REJECTED = [
+    "loops --tile 0",
+    "automata --window 0",
+    "loops --size 0",
+    "sudoku data/sudoku/hard.txt --model",
+    "sudoku data/sudoku/hard.txt --count",
+    "sudoku_bits data/sudoku/hard.txt --backjump",
+    "automata --flat",
+    "automata --tile 10",
+    "loops --rule 90",
+    "loops --window 8",
+    "loops --rules all",
+    "loops --headless --model --flat",
+    "loops --count --tile 10",
+    "automata --count --window 8",
+    "automata --rows 100",
+    "loops --headless --workers 2",
+    "loops --binary",
+    "automata --count --binary",
+    "loops --headless --fps 30",
+    "loops --headless --array --model",
+    "sudoku_mini data/sudoku/hard.txt --parallel 2",
+    "automata --parallel 2",
+    "loops --headless --parallel 2 --portfolio 2",
+]
+
+
+def parse(monkeypatch: pytest.MonkeyPatch, line: str) -> None:
+    """Parse a command line given to run.py."""
+    monkeypatch.setattr("sys.argv", ["run", *shlex.split(line)])
+    run.parse_args()
+
+
+@pytest.mark.parametrize("line", ACCEPTED)
+def test_accepted(monkeypatch: pytest.MonkeyPatch, line: str) -> None:
+    parse(monkeypatch, line)
+
+
+@pytest.mark.parametrize("line", REJECTED)
+def test_rejected(monkeypatch: pytest.MonkeyPatch, line: str) -> None:
+    with pytest.raises(SystemExit):
+        parse(monkeypatch, line)
@@ -0,0 +1,128 @@
+"""Propagation queues must pop in their order and hold a position only once."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from src import loops, sudoku_mini
+from src.scheduler import QUEUE_ORDERS, DegreeQueue, LifoQueue, PropagationQueue
+from src.solver import Config, count_solutions
+from src.space import PlanarSpace
+from src.stats import Stats
+
+CORNER = (0, 0)
+SIDE = (1, 0)
+CENTER = (1, 1)
+ORDER = [CORNER, CENTER, SIDE]
+
+
+def grid_space(queue: PropagationQueue) -> PlanarSpace:
+    """Return an unsolved 3x3 loops scene with the given queue, keeping stats."""
+    space = loops.Scene(queue=queue, count=loops.STATE_COUNT, size=(3, 3))
+    space.stats = Stats()
+    return space
+
+
+def drain(queue: PropagationQueue) -> list[object]:
+    """Pop all waiting indices in order."""
+    popped = []
+    while queue:
+        popped.append(queue.pop())
+    return popped
+
+
+@pytest.mark.parametrize(
+    ("queue", "expected"),
+    [
+        (PropagationQueue(), ORDER),
+        (LifoQueue(), ORDER[::-1]),
+        (DegreeQueue(), [CENTER, SIDE, CORNER]),
+    ],
+    ids=["fifo", "lifo", "degree"],
+)
+def test_order(queue: PropagationQueue, expected: list[object]) -> None:
+    space = grid_space(queue)
+    for index in ORDER:
+        queue.push(space, index)
+    assert len(queue) == len(ORDER)
+    assert drain(queue) == expected
+    assert not queue
+
+
+def test_degree_ties_first_in() -> None:
+    queue = DegreeQueue()
+    space = grid_space(queue)
+    corners = [(2, 2), (0, 0), (2, 0)]
+    for index in corners:
+        queue.push(space, index)
+    assert drain(queue) == corners
+
+
+def test_degree_counts_unsolved() -> None:
+    queue = DegreeQueue()
+    space = grid_space(queue)
+    space.get((1, 0)).solve(0)
+    space.get((0, 1)).solve(0)
+    queue.push(space, CENTER)
+    queue.push(space, SIDE)
+    assert drain(queue) == [SIDE, CENTER]
+
+
+@pytest.mark.parametrize("name", QUEUE_ORDERS)
+def test_dedup(name: str) -> None:
+    queue = QUEUE_ORDERS[name]()
+    space = grid_space(queue)
+    assert space.stats is not None
+    for index in [*ORDER, CORNER, CENTER, CORNER]:
+        queue.push(space, index)
+    assert len(queue) == len(ORDER)
+    assert space.stats.queue_pushes == len(ORDER)
+    assert space.stats.queue_skips == 3
+    assert space.stats.max_queue == len(ORDER)
+    assert sorted(drain(queue)) == sorted(ORDER)
+    queue.push(space, CORNER)
+    assert drain(queue) == [CORNER]
+
+
+@pytest.mark.parametrize("name", QUEUE_ORDERS)
+def test_copy_and_clear(name: str) -> None:
+    queue = QUEUE_ORDERS[name]()
+    space = grid_space(queue)
+    for index in ORDER:
+        queue.push(space, index)
+    copy = queue.copy()
+    assert type(copy) is type(queue)
+    queue.clear()
+    assert not queue
+    queue.push(space, CORNER)
+    assert drain(queue) == [CORNER]
+    queue = QUEUE_ORDERS[name]()
+    for index in ORDER:
+        queue.push(space, index)
+    assert drain(copy) == drain(queue)
+
+
+@pytest.mark.parametrize("name", QUEUE_ORDERS)
+def test_use_queue_moves_waiting(name: str) -> None:
+    space = grid_space(PropagationQueue())
+    for index in ORDER:
+        space.queue.push(space, index)
+    space.use_queue(QUEUE_ORDERS[name]())
+    assert type(space.queue) is QUEUE_ORDERS[name]
+    assert sorted(drain(space.queue)) == sorted(ORDER)
+
+
+@pytest.mark.parametrize("name", QUEUE_ORDERS)
+def test_count_solutions(name: str) -> None:
+    config = Config(queue=name)
+    random.seed(0)
+    scene = loops.create_scene(4)
+    scene.start_trail()
+    assert count_solutions(scene, config=config) == 256
+    random.seed(0)
+    table = sudoku_mini.create_table()
+    table.load(" 2\n")
+    table.start_trail()
+    assert count_solutions(table, 5, config=config) == 5
@@ -0,0 +1,97 @@
+"""Search options that prune the tree must find every solution."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from src import automata, loops, sudoku_mini
+from src.solver import Config, count_solutions, propagate_queue
+from src.space import Space
+from src.transposition import Zobrist
+
+SUDOKU = Path(__file__).parent.parent / "data" / "sudoku" / "medium.txt"
+SUDOKU_ROW = "     2 15"
+
+
+def sudoku_table(*, model: bool = False) -> Space:
+    """Return the medium sudoku with three givens of the first row removed."""
+    rows = SUDOKU.read_text().split("\n")
+    table = sudoku_mini.create_table(model=model)
+    table.load("\n".join([SUDOKU_ROW, *rows[1:]]))
+    return table
+
+
+SPACES: dict[str, tuple[Callable[[], Space], int]] = {
+    "loops": (lambda: loops.create_scene(4), 256),
+    "loops_flat": (lambda: loops.create_scene(4, flat=True), 256),
+    "loops_model": (lambda: loops.create_scene(4, model=True), 256),
+    "loops_array": (lambda: loops.create_scene(4, array=True), 256),
+    "automata": (lambda: automata.create_scene((5, 5)), 2592),
+    "automata_model": (lambda: automata.create_scene((5, 5), model=True), 2592),
+    "automata_array": (lambda: automata.create_scene((5, 5), array=True), 2592),
+    "automata_90": (lambda: automata.create_scene((4, 4), rule=90), 1024),
+    "sudoku_mini": (sudoku_table, 48),
+    "sudoku_mini_model": (lambda: sudoku_table(model=True), 48),
+}
+CONFIGS: dict[str, Config] = {
+    "default": Config(),
+    "backjump": Config(backjump=True),
+    "nogoods": Config(nogoods=64),
+    "table": Config(table=64),
+    "nogoods_table": Config(nogoods=64, table=64),
+    "dom_wdeg": Config(backjump=True, variable="dom-wdeg", value="phase"),
+    "lcv": Config(nogoods=64, value="lcv"),
+}
+
+
+@pytest.mark.parametrize("config", CONFIGS.values(), ids=CONFIGS.keys())
+@pytest.mark.parametrize("name", SPACES)
+def test_count_solutions(name: str, config: Config) -> None:
+    create, expected = SPACES[name]
+    random.seed(0)
+    space = create()
+    space.start_trail()
+    assert count_solutions(space, config=config) == expected
+
+
+def state_of(space: Space) -> tuple[list[object], dict[object, int], int]:
+    """Return the domains, edge ranks and hash of the space."""
+    domains = [position.save() for _, position in space.positions]
+    ranks = {index: slot[0] for index, slot in space.edge.slots.items()}
+    return domains, ranks, space.hash
+
+
+def levels(space: Space) -> dict[object, int]:
+    """Return the decision levels of positions with any, no levels being 0."""
+    return {index: level for index, level in (space.reasons or {}).items() if level}
+
+
+@pytest.mark.parametrize("name", SPACES)
+def test_rollback_restores_space(name: str) -> None:
+    create, _ = SPACES[name]
+    random.seed(0)
+    space = create()
+    space.start_trail()
+    space.start_reasons()
+    space.start_hash(Zobrist())
+    assert propagate_queue(space)
+    before = state_of(space)
+    reasons = levels(space)
+    checkpoint = space.checkpoint()
+    index, position = next(
+        (index, position)
+        for index, position in space.positions
+        if not position.is_solved
+    )
+    space.cause = 1
+    space.solve(index, next(iter(position.states)))
+    propagate_queue(space)
+    assert state_of(space) != before
+    space.rollback(checkpoint)
+    assert state_of(space) == before
+    assert levels(space) == reasons
+    assert not space.queue
@@ -0,0 +1,93 @@
+"""Batch sudoku input must be read in both formats, whatever the line endings."""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+
+from src.sudoku_batch import Histogram, read_puzzles, solve_puzzle, solve_stream
+
+SUDOKU = Path(__file__).parent.parent / "data" / "sudoku" / "medium.txt"
+PUZZLE = SUDOKU.read_text().rstrip("\n")
+ONE_LINE = PUZZLE.replace("\n", "").replace(" ", ".")
+
+
+def nine_lines(*puzzles: str, newline: str = "\n") -> list[str]:
+    """Return the lines of puzzles separated by a blank line, as read from a file."""
+    text = "\n\n".join(puzzles) + "\n"
+    return io.StringIO(text.replace("\n", newline), newline="").readlines()
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_nine_lines(newline: str) -> None:
+    lines = nine_lines(PUZZLE, PUZZLE, newline=newline)
+    assert list(read_puzzles(lines)) == [(PUZZLE, False), (PUZZLE, False)]
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_one_line(newline: str) -> None:
+    lines = [ONE_LINE + newline, ONE_LINE.replace(".", "0") + newline]
+    assert list(read_puzzles(lines)) == [(PUZZLE, True), (PUZZLE, True)]
+
+
+def test_leading_empty_row() -> None:
+    rows = PUZZLE.split("\n")
+    first = "\n".join(["", *rows[1:]])
+    lines = nine_lines(first, first, newline="\r\n")
+    assert list(read_puzzles(lines)) == [(first, False), (first, False)]
+
+
+def test_mixed_formats() -> None:
+    lines = [*nine_lines(PUZZLE), "\n", ONE_LINE + "\n", *nine_lines(PUZZLE)]
+    assert list(read_puzzles(lines)) == [
+        (PUZZLE, False),
+        (PUZZLE, True),
+        (PUZZLE, False),
+    ]
+
+
+def test_trailing_blank_lines() -> None:
+    lines = [*nine_lines(PUZZLE), "\n", "\n"]
+    assert list(read_puzzles(lines)) == [(PUZZLE, False)]
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["12x\n" * 9, "11\n", "1" * 82 + "\n"],
+    ids=["letters", "conflict", "long_line"],
+)
+def test_malformed_passes_through(text: str) -> None:
+    puzzles = list(read_puzzles(io.StringIO(text)))
+    assert puzzles
+    out = io.StringIO()
+    report = solve_stream(io.StringIO(text), out, workers=1)
+    assert report.solved + report.failed == len(puzzles)
+    assert report.failed == len(puzzles)
+    assert out.getvalue().startswith(puzzles[0][0])
+
+
+def test_solve_puzzle() -> None:
+    solution, elapsed = solve_puzzle(PUZZLE)
+    assert solution is not None
+    assert " " not in solution
+    assert elapsed >= 0
+
+
+def test_histogram_percentiles() -> None:
+    histogram = Histogram()
+    assert histogram.percentile(0.5) == 0.0
+    for _ in range(99):
+        histogram.add(0.001)
+    histogram.add(1.0)
+    assert histogram.total == 100
+    assert 0.001 <= histogram.percentile(0.5) <= 0.001 * 1.05
+    assert histogram.percentile(0.99) == histogram.percentile(0.5)
+    assert 1.0 <= histogram.percentile(1.0) <= 1.05
+
+
+def test_histogram_zero() -> None:
+    histogram = Histogram()
+    histogram.add(0.0)
+    assert histogram.percentile(0.5) == pytest.approx(1.05e-6)
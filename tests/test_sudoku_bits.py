@@ -0,0 +1,91 @@
+"""The bitmask sudoku board must solve like the generic solver."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+
+from src import sudoku_mini
+from src.solver import solve_space
+from src.stats import Stats
+from src.sudoku_bits import CELLS, COUNT, FULL, UNITS, Board
+
+DATA = Path(__file__).parent.parent / "data" / "sudoku"
+NAMES = ["medium", "hard", "expert"]
+
+
+def is_solution(board: Board) -> bool:
+    """Return True if every unit of the board holds every digit once."""
+    return all(
+        sum(1 << board.digits[cell] for cell in unit if board.digits[cell] >= 0)
+        == FULL
+        for unit in UNITS
+    )
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_solve(name: str) -> None:
+    text = (DATA / f"{name}.txt").read_text()
+    board = Board()
+    board.stats = Stats()
+    board.load(text)
+    assert board.solve()
+    assert is_solution(board)
+    assert board.stats.nodes > 0
+    for given, solved in zip(text.replace("\n", ""), str(board).replace("\n", "")):
+        assert given in (" ", solved)
+    random.seed(0)
+    table = sudoku_mini.create_table()
+    table.load(text)
+    table.start_trail()
+    assert solve_space(table)
+    assert str(board) == str(table)
+
+
+def test_empty() -> None:
+    board = Board()
+    assert board.solve()
+    assert is_solution(board)
+
+
+def test_conflicting_givens() -> None:
+    board = Board()
+    board.load("11")
+    assert not board.valid
+    assert not board.solve()
+
+
+def test_unsolvable() -> None:
+    board = Board()
+    board.load("12345678 \n        9")
+    assert board.valid
+    assert not board.solve()
+    assert str(board).split("\n")[:2] == ["12345678 ", "        9"]
+
+
+def test_place_and_unplace() -> None:
+    board = Board()
+    board.place(0, 4)
+    assert not board.candidates(COUNT - 1) >> 4 & 1
+    assert not board.candidates(CELLS - COUNT) >> 4 & 1
+    assert not board.candidates(COUNT + 1) >> 4 & 1
+    assert board.candidates(CELLS - 1) == FULL
+    board.unplace(0)
+    assert all(board.candidates(cell) == FULL for cell in range(CELLS))
+    assert board.digits[0] == -1
+
+
+def test_select_hidden_single() -> None:
+    board = Board()
+    for x, y in ((1, 3), (2, 6), (3, 1), (6, 2)):
+        board.place(y * COUNT + x, 0)
+    assert board.candidates(0).bit_count() == COUNT
+    assert board.select() == (0, 1)
+
+
+def test_select_conflict() -> None:
+    board = Board()
+    board.load("12345678 \n        9")
+    assert board.select() == (COUNT - 1, 0)
@@ -0,0 +1,116 @@
+"""Sudoku inference rules must remove states without losing solutions."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+
+from src import sudoku_mini
+from src.solver import Config, count_solutions
+from src.stats import Stats
+from src.sudoku_bits import FULL
+from src.sudoku_rules import (
+    CONFLICT,
+    RULES,
+    hidden_pairs,
+    hidden_singles,
+    naked_pairs,
+    pointing,
+)
+
+SUDOKU = Path(__file__).parent.parent / "data" / "sudoku" / "medium.txt"
+SUDOKU_ROW = "     2 15"
+SOLUTIONS = 48
+PAIR = 0b11
+ROW = [(x, 0) for x in range(sudoku_mini.COUNT)]
+
+
+def sudoku_table(rules: tuple[str, ...]) -> sudoku_mini.Table:
+    """Return the medium sudoku with three givens removed, using the rules."""
+    rows = SUDOKU.read_text().split("\n")
+    table = sudoku_mini.create_table()
+    table.load("\n".join([SUDOKU_ROW, *rows[1:]]))
+    table.rules = rules
+    table.start_trail()
+    return table
+
+
+def empty_table() -> sudoku_mini.Table:
+    """Return a table without givens."""
+    return sudoku_mini.create_table()
+
+
+RULE_SETS = {
+    "none": (),
+    **{name: (name,) for name in RULES},
+    "all": tuple(RULES),
+}
+
+
+@pytest.mark.parametrize("nogoods", [0, 64])
+@pytest.mark.parametrize("name", RULE_SETS)
+def test_count_solutions(name: str, nogoods: int) -> None:
+    random.seed(0)
+    table = sudoku_table(RULE_SETS[name])
+    stats = Stats()
+    config = Config(nogoods=nogoods, rules=RULE_SETS[name])
+    assert count_solutions(table, stats=stats, config=config) == SOLUTIONS
+    assert set(stats.rules) <= set(RULE_SETS[name])
+    if len(RULE_SETS[name]) == 1:
+        assert stats.rules[name] > 0
+
+
+def test_hidden_singles() -> None:
+    table = empty_table()
+    for index in ROW[1:]:
+        table.remove_mask(index, 1)
+    assert hidden_singles(table) == 1
+    assert table.get(ROW[0]).mask == 1
+
+
+def test_hidden_singles_conflict() -> None:
+    table = empty_table()
+    for index in ROW:
+        table.remove_mask(index, 1)
+    assert hidden_singles(table) == CONFLICT
+
+
+def test_naked_pairs() -> None:
+    table = empty_table()
+    for index in ROW[:2]:
+        table.remove_mask(index, FULL & ~PAIR)
+    assert naked_pairs(table) > 0
+    assert table.get((5, 0)).mask == FULL & ~PAIR
+    assert table.get((2, 2)).mask == FULL & ~PAIR
+    assert table.get((0, 5)).mask == FULL
+    assert table.get(ROW[0]).mask == PAIR
+
+
+def test_hidden_pairs() -> None:
+    table = empty_table()
+    for index in ROW[2:]:
+        table.remove_mask(index, PAIR)
+    assert hidden_pairs(table) > 0
+    assert table.get(ROW[0]).mask == PAIR
+    assert table.get(ROW[1]).mask == PAIR
+
+
+def test_pointing() -> None:
+    table = empty_table()
+    for x in range(3):
+        for y in (1, 2):
+            table.remove_mask((x, y), 1)
+    assert pointing(table) == len(ROW) - 3
+    assert table.get((5, 0)).mask == FULL & ~1
+    assert table.get(ROW[0]).mask == FULL
+
+
+def test_box_line_reduction() -> None:
+    table = empty_table()
+    for index in ROW[3:]:
+        table.remove_mask(index, 1)
+    assert pointing(table) == 6
+    assert table.get((1, 1)).mask == FULL & ~1
+    assert table.get((3, 1)).mask == FULL